@@ -2,8 +2,10 @@
 Authentication and authorization for multi-tenant SaaS.
 """
 import os
+import time
 from datetime import datetime, timedelta
 from typing import Optional
+from cachetools import TTLCache
 from jose import JWTError, jwt
 import bcrypt
 from fastapi import Depends, HTTPException, status
@@ -17,6 +19,9 @@ ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24 * 7  # 7 days
 
 security = HTTPBearer()
 
+# Resolved (user, exp) by bearer token, so dashboard polling doesn't hit the DB per request
+_token_cache = TTLCache(maxsize=1024, ttl=60)
+
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a password against a hash."""
@@ -115,8 +120,17 @@ async def get_current_user(
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+    token = credentials.credentials
+    cached = _token_cache.get(token)
+    if cached is not None:
+        user, exp = cached
+        # The token may expire while its lookup is still cached
+        if exp is not None and exp <= time.time():
+            _token_cache.pop(token, None)
+            raise credentials_exception
+        return user
+    
     try:
-        token = credentials.credentials
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         user_id: int = payload.get("sub")
         if user_id is None:
@@ -127,9 +141,15 @@ async def get_current_user(
     user = await get_user_by_id(user_id)
     if user is None:
         raise credentials_exception
+    _token_cache[token] = (user, payload.get("exp"))
     return user
 
 
+def invalidate_token(token: str):
+    """Drop a cached token lookup (e.g. on logout)."""
+    _token_cache.pop(token, None)
+
+
 async def get_current_organization(user: dict = Depends(get_current_user)) -> int:
     """Get current user's organization ID."""
     org_id = user.get("organization_id")
@@ -3,17 +3,70 @@ Database models and functions for storing call data and statistics.
 Uses PostgreSQL (Supabase) for persistent storage.
 """
 
+import asyncio
 import asyncpg
 import json
+import logging
+from contextlib import asynccontextmanager
 from datetime import datetime
 from typing import Dict, List, Optional
 import os
 
+logger = logging.getLogger(__name__)
+
 # Get database URL from environment (Supabase connection string)
 DATABASE_URL = os.getenv("POSTGRES_URL") or os.getenv("DATABASE_URL")
 
-# Connection pool (will be initialized on first use)
+# Optional read replica for dashboard/reporting queries (falls back to primary)
+DATABASE_READ_URL = os.getenv("POSTGRES_READ_URL") or os.getenv("DATABASE_READ_URL")
+
+# Pool sizing (per process); keep warm connections so webhook handlers
+# don't pay the connect/TLS/auth handshake inside Twilio's timeout window
+DB_POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", "10"))
+DB_POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", "25"))
+# Prepared statement cache per connection. Must stay 0 behind pgbouncer in
+# transaction mode (Supabase pooler); set e.g. 1024 for direct connections
+DB_STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE_SIZE", "0"))
+
+# Whether the event loop outlives requests, so background writer/queue tasks
+# keep running and shutdown hooks flush them. Not on Vercel: Mangum runs
+# without lifespan and the loop is frozen between invocations, so writes
+# must finish inside the request. Vercel sets VERCEL=1.
+LONG_RUNNING_SERVER = os.getenv(
+    "LONG_RUNNING_SERVER", "0" if os.getenv("VERCEL") else "1"
+).lower() in ("1", "true", "yes")
+
+# Connection pools (will be initialized on first use)
 _pool = None
+_read_pool = None
+
+
+async def _init_connection(conn):
+    """Per-connection setup: decode JSONB columns straight to Python objects."""
+    await conn.set_type_codec(
+        'jsonb', encoder=json.dumps, decoder=json.loads, schema='pg_catalog'
+    )
+
+
+async def _create_pool(dsn: str):
+    """Create an asyncpg pool with the shared connection settings."""
+    try:
+        return await asyncpg.create_pool(
+            dsn,
+            min_size=DB_POOL_MIN_SIZE,
+            max_size=DB_POOL_MAX_SIZE,
+            max_queries=50000,
+            max_inactive_connection_lifetime=300,
+            command_timeout=60,
+            statement_cache_size=DB_STATEMENT_CACHE_SIZE,
+            init=_init_connection
+        )
+    except Exception as e:
+        raise ValueError(
+            f"Failed to connect to Postgres database: {str(e)}. "
+            "Please check your POSTGRES_URL in Vercel environment variables."
+        ) from e
+
 
 async def get_pool():
     """Get or create database connection pool."""
@@ -24,23 +77,43 @@ async def get_pool():
                 "DATABASE_URL or POSTGRES_URL environment variable must be set. "
                 "Please add POSTGRES_URL to your Vercel environment variables."
             )
-        try:
-            # Supabase uses pgbouncer which doesn't support prepared statements
-            # Set statement_cache_size=0 to disable prepared statements
-            _pool = await asyncpg.create_pool(
-                DATABASE_URL,
-                min_size=1,
-                max_size=10,
-                command_timeout=60,
-                statement_cache_size=0  # Required for pgbouncer/transaction pooling
-            )
-        except Exception as e:
-            raise ValueError(
-                f"Failed to connect to Postgres database: {str(e)}. "
-                "Please check your POSTGRES_URL in Vercel environment variables."
-            ) from e
+        _pool = await _create_pool(DATABASE_URL)
     return _pool
 
+
+async def get_read_pool():
+    """Get the pool for read-only dashboard queries.
+
+    Uses the read replica when DATABASE_READ_URL is set so slow reporting
+    queries don't compete with call-path writes; otherwise the primary pool.
+    """
+    global _read_pool
+    if not DATABASE_READ_URL:
+        return await get_pool()
+    if _read_pool is None:
+        _read_pool = await _create_pool(DATABASE_READ_URL)
+    return _read_pool
+
+async def close_pool():
+    """Close the connection pools (on application shutdown)."""
+    global _pool, _read_pool
+    if _read_pool is not None:
+        await _read_pool.close()
+        _read_pool = None
+    if _pool is not None:
+        await _pool.close()
+        _pool = None
+
+@asynccontextmanager
+async def _trigger_setup(conn, trigger_name: str):
+    """Transaction for creating a trigger; yields True if it doesn't exist yet.
+    The advisory lock stops workers running init_db at the same time (parallel
+    cold starts, WEB_CONCURRENCY) from both trying to create it."""
+    async with conn.transaction():
+        await conn.execute("SELECT pg_advisory_xact_lock(hashtext($1))", trigger_name)
+        yield not await conn.fetchval("SELECT 1 FROM pg_trigger WHERE tgname = $1", trigger_name)
+
+
 async def init_db():
     """Initialize the database with required tables."""
     pool = await get_pool()
@@ -89,7 +162,7 @@ async def init_db():
                 phone_number VARCHAR(50),
                 email VARCHAR(255),
                 address TEXT,
-                config_json TEXT,
+                config_json JSONB,
                 voice VARCHAR(100) DEFAULT 'Polly.Matthew-Neural',
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                 updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
@@ -142,6 +215,8 @@ async def init_db():
                 caller_name VARCHAR(255),
                 is_emergency BOOLEAN DEFAULT false,
                 booking_status VARCHAR(50) DEFAULT 'pending',
+                call_start_time TIMESTAMP,
+                call_duration_seconds INTEGER,
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                 FOREIGN KEY (call_sid) REFERENCES calls(call_sid) ON DELETE CASCADE
             )
@@ -170,6 +245,18 @@ async def init_db():
             )
         """)
         
+        # Indexes for newest-first order listings and keyset pagination
+        # (id breaks ties between orders created at the same timestamp)
+        await conn.execute("""
+            CREATE INDEX IF NOT EXISTS idx_orders_created_id ON orders (created_at DESC, id DESC)
+        """)
+        await conn.execute("""
+            CREATE INDEX IF NOT EXISTS idx_orders_status_type_created_id
+            ON orders (order_status, order_type, created_at DESC, id DESC)
+        """)
+        await conn.execute("DROP INDEX IF EXISTS idx_orders_created")
+        await conn.execute("DROP INDEX IF EXISTS idx_orders_status_type_created")
+        
         # Add organization_id to existing tables if they don't have it (migration)
         # Postgres doesn't support IF NOT EXISTS for ALTER TABLE, so we check first
         try:
@@ -213,6 +300,105 @@ async def init_db():
         except Exception as e:
             pass  # Column already exists or other error
         
+        # Maintained order counter so dashboard totals don't need COUNT(*) scans
+        await conn.execute("""
+            CREATE TABLE IF NOT EXISTS order_stats (
+                key VARCHAR(50) PRIMARY KEY,
+                val BIGINT NOT NULL DEFAULT 0
+            )
+        """)
+        async with _trigger_setup(conn, "orders_count_trg") as missing:
+            if missing:
+                await conn.execute("""
+                    CREATE OR REPLACE FUNCTION order_stats_count() RETURNS trigger AS $$
+                    BEGIN
+                        IF TG_OP = 'INSERT' THEN
+                            UPDATE order_stats SET val = val + 1 WHERE key = 'total';
+                        ELSIF TG_OP = 'DELETE' THEN
+                            UPDATE order_stats SET val = val - 1 WHERE key = 'total';
+                        END IF;
+                        RETURN NULL;
+                    END;
+                    $$ LANGUAGE plpgsql
+                """)
+                await conn.execute("""
+                    CREATE TRIGGER orders_count_trg
+                    AFTER INSERT OR DELETE ON orders
+                    FOR EACH ROW EXECUTE FUNCTION order_stats_count()
+                """)
+        # Seed from the existing rows the first time
+        await conn.execute("""
+            INSERT INTO order_stats (key, val)
+            SELECT 'total', COUNT(*) FROM orders
+            ON CONFLICT (key) DO NOTHING
+        """)
+        
+        # Call timing copied onto appointments so exports don't need to join calls
+        try:
+            result = await conn.fetchval("""
+                SELECT column_name FROM information_schema.columns 
+                WHERE table_name = 'appointments' AND column_name = 'call_start_time'
+            """)
+            if not result:
+                await conn.execute("ALTER TABLE appointments ADD COLUMN call_start_time TIMESTAMP")
+                await conn.execute("ALTER TABLE appointments ADD COLUMN call_duration_seconds INTEGER")
+                await conn.execute("""
+                    UPDATE appointments a
+                    SET call_start_time = c.start_time, call_duration_seconds = c.duration_seconds
+                    FROM calls c WHERE c.call_sid = a.call_sid
+                """)
+        except:
+            pass
+        
+        async with _trigger_setup(conn, "calls_sync_appointments_trg") as missing:
+            if missing:
+                # Keep appointments in sync when the call starts/ends
+                await conn.execute("""
+                    CREATE OR REPLACE FUNCTION calls_sync_appointments() RETURNS trigger AS $$
+                    BEGIN
+                        UPDATE appointments
+                        SET call_start_time = NEW.start_time, call_duration_seconds = NEW.duration_seconds
+                        WHERE call_sid = NEW.call_sid;
+                        RETURN NULL;
+                    END;
+                    $$ LANGUAGE plpgsql
+                """)
+                await conn.execute("""
+                    CREATE TRIGGER calls_sync_appointments_trg
+                    AFTER INSERT OR UPDATE OF start_time, duration_seconds ON calls
+                    FOR EACH ROW EXECUTE FUNCTION calls_sync_appointments()
+                """)
+                # Appointments are saved mid-call, after the call row exists
+                await conn.execute("""
+                    CREATE OR REPLACE FUNCTION appointments_fill_call_timing() RETURNS trigger AS $$
+                    BEGIN
+                        SELECT start_time, duration_seconds
+                        INTO NEW.call_start_time, NEW.call_duration_seconds
+                        FROM calls WHERE call_sid = NEW.call_sid;
+                        RETURN NEW;
+                    END;
+                    $$ LANGUAGE plpgsql
+                """)
+                await conn.execute("""
+                    CREATE TRIGGER appointments_fill_call_timing_trg
+                    BEFORE INSERT ON appointments
+                    FOR EACH ROW EXECUTE FUNCTION appointments_fill_call_timing()
+                """)
+        
+        # Store business config as binary JSONB instead of text (existing databases)
+        try:
+            result = await conn.fetchval("""
+                SELECT data_type FROM information_schema.columns 
+                WHERE table_name = 'businesses' AND column_name = 'config_json'
+            """)
+            if result == 'text':
+                await conn.execute("""
+                    ALTER TABLE businesses ALTER COLUMN config_json TYPE JSONB
+                    USING NULLIF(config_json, '')::jsonb
+                """)
+        except Exception as e:
+            pass  # Leave as text if existing rows aren't valid JSON
+        
         # Update existing businesses to have voice if null
         await conn.execute("UPDATE businesses SET voice = 'Polly.Matthew-Neural' WHERE voice IS NULL OR voice = ''")
         
@@ -510,6 +696,78 @@ async def save_conversation_turn(call_sid: str, user_input: str, assistant_respo
         """, call_sid, user_input, assistant_response, turn_number)
 
 
+async def save_conversation_turns(turns: List[tuple]):
+    """Save many conversation turns in one round-trip.
+
+    Args:
+        turns: List of (call_sid, user_input, assistant_response, turn_number)
+    """
+    pool = await get_pool()
+    async with pool.acquire() as conn:
+        await conn.executemany("""
+            INSERT INTO conversations (call_sid, user_input, assistant_response, turn_number)
+            VALUES ($1, $2, $3, $4)
+        """, turns)
+
+
+# On a long-running server, conversation turns are buffered and written in
+# batches by a background task
+TURN_BATCH_SIZE = 64
+TURN_FLUSH_INTERVAL = 0.1  # seconds
+
+_turn_queue = None
+_turn_writer = None
+
+
+async def queue_conversation_turn(call_sid: str, user_input: str, assistant_response: str, turn_number: int):
+    """Save a conversation turn.
+
+    On a long-running server the turn is buffered for the batched writer and
+    this doesn't wait on the database; otherwise it is written right away.
+    """
+    global _turn_queue, _turn_writer
+    if not LONG_RUNNING_SERVER:
+        await save_conversation_turn(call_sid, user_input, assistant_response, turn_number)
+        return
+    if _turn_queue is None:
+        _turn_queue = asyncio.Queue()
+    if _turn_writer is None or _turn_writer.done():
+        _turn_writer = asyncio.create_task(_write_conversation_turns())
+    _turn_queue.put_nowait((call_sid, user_input, assistant_response, turn_number))
+
+
+def _drain_turn_queue(batch: list) -> list:
+    """Move queued turns into batch, up to TURN_BATCH_SIZE."""
+    try:
+        while len(batch) < TURN_BATCH_SIZE:
+            batch.append(_turn_queue.get_nowait())
+    except asyncio.QueueEmpty:
+        pass
+    return batch
+
+
+async def _write_conversation_turns():
+    """Background task: flush queued turns every TURN_FLUSH_INTERVAL."""
+    while True:
+        batch = _drain_turn_queue([await _turn_queue.get()])
+        try:
+            # Shielded so a shutdown cancel doesn't drop an in-flight batch
+            await asyncio.shield(save_conversation_turns(batch))
+        except Exception as e:
+            logger.error(f"Error saving {len(batch)} conversation turns: {e}", exc_info=True)
+        await asyncio.sleep(TURN_FLUSH_INTERVAL)
+
+
+async def flush_conversation_turns():
+    """Stop the batched writer and save anything still queued (on shutdown)."""
+    global _turn_writer
+    if _turn_writer is not None:
+        _turn_writer.cancel()
+        _turn_writer = None
+    while _turn_queue is not None and not _turn_queue.empty():
+        await save_conversation_turns(_drain_turn_queue([]))
+
+
 async def save_appointment(call_sid: str, caller_phone: str, appointment_info: Dict):
     """Save appointment information."""
     pool = await get_pool()
@@ -579,7 +837,7 @@ async def mark_call_emergency(call_sid: str):
 
 async def get_recent_calls(limit: int = 50) -> List[Dict]:
     """Get recent calls with full details."""
-    pool = await get_pool()
+    pool = await get_read_pool()
     async with pool.acquire() as conn:
         rows = await conn.fetch("""
             SELECT c.*, 
@@ -598,7 +856,7 @@ async def get_recent_calls(limit: int = 50) -> List[Dict]:
 
 async def get_call_details(call_sid: str) -> Optional[Dict]:
     """Get full details of a specific call."""
-    pool = await get_pool()
+    pool = await get_read_pool()
     async with pool.acquire() as conn:
         # Get call info
         call = await conn.fetchrow("SELECT * FROM calls WHERE call_sid = $1", call_sid)
@@ -622,9 +880,33 @@ async def get_call_details(call_sid: str) -> Optional[Dict]:
         return call_dict
 
 
+async def get_call_transcripts(since: datetime) -> Dict[str, List[Dict]]:
+    """Get the conversation turns of every call started since a given time.
+
+    Returns:
+        Dict of call_sid -> list of {"user", "assistant"} turns in order
+    """
+    pool = await get_read_pool()
+    async with pool.acquire() as conn:
+        rows = await conn.fetch("""
+            SELECT conv.call_sid, conv.user_input, conv.assistant_response
+            FROM conversations conv
+            JOIN calls c ON c.call_sid = conv.call_sid
+            WHERE c.start_time >= $1
+            ORDER BY conv.call_sid, conv.turn_number
+        """, since)
+    transcripts = {}
+    for row in rows:
+        transcripts.setdefault(row["call_sid"], []).append({
+            "user": row["user_input"] or "",
+            "assistant": row["assistant_response"] or ""
+        })
+    return transcripts
+
+
 async def get_statistics() -> Dict:
     """Get dashboard statistics."""
-    pool = await get_pool()
+    pool = await get_read_pool()
     async with pool.acquire() as conn:
         stats = {}
         
@@ -671,7 +953,7 @@ async def get_statistics() -> Dict:
 
 async def get_appointments(limit: int = 50) -> List[Dict]:
     """Get all appointments."""
-    pool = await get_pool()
+    pool = await get_read_pool()
     async with pool.acquire() as conn:
         rows = await conn.fetch("""
             SELECT a.*, c.start_time, c.duration_seconds
@@ -696,7 +978,7 @@ async def update_appointment_status(appointment_id: int, status: str):
 
 async def get_chart_data(days: int = 30) -> Dict:
     """Get data for charts - daily calls, appointments, etc."""
-    pool = await get_pool()
+    pool = await get_read_pool()
     async with pool.acquire() as conn:
         # Daily calls for last N days
         daily_calls = await conn.fetch(f"""
@@ -729,7 +1011,7 @@ async def get_chart_data(days: int = 30) -> Dict:
 
 async def search_calls(query: str, limit: int = 50) -> List[Dict]:
     """Search calls by caller phone or call SID."""
-    pool = await get_pool()
+    pool = await get_read_pool()
     async with pool.acquire() as conn:
         search_term = f"%{query}%"
         rows = await conn.fetch("""
@@ -750,7 +1032,7 @@ async def search_calls(query: str, limit: int = 50) -> List[Dict]:
 
 async def search_appointments(query: str, limit: int = 50) -> List[Dict]:
     """Search appointments by caller phone, reason, or insurance."""
-    pool = await get_pool()
+    pool = await get_read_pool()
     async with pool.acquire() as conn:
         search_term = f"%{query}%"
         rows = await conn.fetch("""
@@ -767,72 +1049,105 @@ async def search_appointments(query: str, limit: int = 50) -> List[Dict]:
         return [dict(row) for row in rows]
 
 
-async def get_all_calls_for_export() -> List[Dict]:
-    """Get all calls for CSV export."""
-    pool = await get_pool()
+async def iter_calls_for_export():
+    """Yield all calls for CSV export, streamed from a server-side cursor."""
+    pool = await get_read_pool()
     async with pool.acquire() as conn:
-        rows = await conn.fetch("""
-            SELECT c.*, 
-                   COUNT(DISTINCT conv.id) as conversation_turns,
-                   a.id as appointment_id,
-                   a.booking_status
-            FROM calls c
-            LEFT JOIN conversations conv ON c.call_sid = conv.call_sid
-            LEFT JOIN appointments a ON c.call_sid = a.call_sid
-            GROUP BY c.id, a.id
-            ORDER BY c.start_time DESC
-        """)
-        return [dict(row) for row in rows]
-
-
-async def get_all_appointments_for_export() -> List[Dict]:
-    """Get all appointments for CSV export."""
-    pool = await get_pool()
+        async with conn.transaction():
+            async for row in conn.cursor("""
+                SELECT c.*, 
+                       COUNT(DISTINCT conv.id) as conversation_turns,
+                       a.id as appointment_id,
+                       a.booking_status
+                FROM calls c
+                LEFT JOIN conversations conv ON c.call_sid = conv.call_sid
+                LEFT JOIN appointments a ON c.call_sid = a.call_sid
+                GROUP BY c.id, a.id
+                ORDER BY c.start_time DESC
+            """, prefetch=500):
+                yield dict(row)
+
+
+async def iter_appointments_for_export():
+    """Yield all appointments for CSV export, streamed from a server-side cursor."""
+    pool = await get_read_pool()
     async with pool.acquire() as conn:
-        rows = await conn.fetch("""
-            SELECT a.*, c.start_time, c.duration_seconds
-            FROM appointments a
-            LEFT JOIN calls c ON a.call_sid = c.call_sid
-            ORDER BY a.created_at DESC
-        """)
-        return [dict(row) for row in rows]
+        async with conn.transaction():
+            async for row in conn.cursor("""
+                SELECT a.*, a.call_start_time AS start_time, a.call_duration_seconds AS duration_seconds
+                FROM appointments a
+                ORDER BY a.created_at DESC
+            """, prefetch=500):
+                yield dict(row)
 
 
 # ==================== ORDER FUNCTIONS ====================
 
-async def get_orders(limit: int = 50, status: Optional[str] = None, order_type: Optional[str] = None) -> List[Dict]:
-    """Get orders with optional filtering."""
-    pool = await get_pool()
+def make_order_cursor(order: Dict) -> str:
+    """Pagination cursor for the rows after this order: "<ISO created_at>_<id>"."""
+    return f"{order['created_at'].isoformat()}_{order['id']}"
+
+
+def parse_order_cursor(cursor: Optional[str]) -> tuple:
+    """Parse a cursor from make_order_cursor into (created_at, id).
+
+    Returns (None, None) for no cursor; raises ValueError if it's malformed.
+    """
+    if not cursor:
+        return None, None
+    created_at, _, order_id = cursor.rpartition("_")
+    return datetime.fromisoformat(created_at), int(order_id)
+
+
+async def get_orders(
+    limit: int = 50,
+    status: Optional[str] = None,
+    order_type: Optional[str] = None,
+    cursor: Optional[str] = None
+) -> List[Dict]:
+    """Get orders with optional filtering.
+
+    Pass make_order_cursor() of the last order from the previous page as
+    cursor to fetch the next page (keyset pagination).
+    """
+    pool = await get_read_pool()
     async with pool.acquire() as conn:
-        if status and order_type:
-            rows = await conn.fetch("""
-                SELECT * FROM orders 
-                WHERE order_status = $1 AND order_type = $2
-                ORDER BY created_at DESC LIMIT $3
-            """, status, order_type, limit)
-        elif status:
-            rows = await conn.fetch("""
-                SELECT * FROM orders 
-                WHERE order_status = $1
-                ORDER BY created_at DESC LIMIT $2
-            """, status, limit)
-        elif order_type:
-            rows = await conn.fetch("""
-                SELECT * FROM orders 
-                WHERE order_type = $1
-                ORDER BY created_at DESC LIMIT $2
-            """, order_type, limit)
-        else:
-            rows = await conn.fetch("""
-                SELECT * FROM orders 
-                ORDER BY created_at DESC LIMIT $1
-            """, limit)
+        conditions = []
+        values = []
+        if status:
+            values.append(status)
+            conditions.append(f"order_status = ${len(values)}")
+        if order_type:
+            values.append(order_type)
+            conditions.append(f"order_type = ${len(values)}")
+        if cursor:
+            values.extend(parse_order_cursor(cursor))
+            conditions.append(f"(created_at, id) < (${len(values) - 1}, ${len(values)})")
+        
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        values.append(limit)
+        rows = await conn.fetch(f"""
+            SELECT * FROM orders 
+            {where}
+            ORDER BY created_at DESC, id DESC LIMIT ${len(values)}
+        """, *values)
         return [dict(row) for row in rows]
 
 
+async def iter_orders_for_export():
+    """Yield all orders for CSV export, streamed from a server-side cursor."""
+    pool = await get_read_pool()
+    async with pool.acquire() as conn:
+        async with conn.transaction():
+            async for row in conn.cursor(
+                "SELECT * FROM orders ORDER BY created_at DESC", prefetch=500
+            ):
+                yield dict(row)
+
+
 async def get_order(order_id: int) -> Optional[Dict]:
     """Get a specific order by ID."""
-    pool = await get_pool()
+    pool = await get_read_pool()
     async with pool.acquire() as conn:
         row = await conn.fetchrow("SELECT * FROM orders WHERE id = $1", order_id)
         return dict(row) if row else None
@@ -849,14 +1164,34 @@ async def update_order_status(order_id: int, status: str):
         """, status, order_id)
 
 
+async def update_order_statuses(updates: List[tuple]):
+    """Update many order statuses in one transaction.
+
+    Args:
+        updates: List of (order_id, status) tuples
+    """
+    if not updates:
+        return
+    pool = await get_pool()
+    async with pool.acquire() as conn:
+        async with conn.transaction():
+            await conn.executemany(
+                "UPDATE orders SET order_status = $1 WHERE id = $2",
+                [(status, order_id) for order_id, status in updates]
+            )
+
+
 async def get_order_statistics() -> Dict:
     """Get order statistics."""
-    pool = await get_pool()
+    pool = await get_read_pool()
     async with pool.acquire() as conn:
         stats = {}
         
-        # Total orders
-        stats["total_orders"] = await conn.fetchval("SELECT COUNT(*) FROM orders")
+        # Total orders (maintained by the orders_count_trg trigger)
+        total = await conn.fetchval("SELECT val FROM order_stats WHERE key = 'total'")
+        if total is None:
+            total = await conn.fetchval("SELECT COUNT(*) FROM orders")
+        stats["total_orders"] = total
         
         # Orders today
         stats["orders_today"] = await conn.fetchval("""
@@ -896,20 +1231,21 @@ async def get_order_statistics() -> Dict:
         return stats
 
 
-async def search_orders(query: str, limit: int = 50) -> List[Dict]:
-    """Search orders by phone, name, or items."""
-    pool = await get_pool()
+async def search_orders(query: str, limit: int = 50, cursor: Optional[str] = None) -> List[Dict]:
+    """Search orders by phone, name, or items (cursor as in get_orders)."""
+    pool = await get_read_pool()
     async with pool.acquire() as conn:
         search_term = f"%{query}%"
         rows = await conn.fetch("""
             SELECT * FROM orders 
-            WHERE caller_phone LIKE $1 
+            WHERE (caller_phone LIKE $1 
                OR customer_name LIKE $1
                OR pickup_name LIKE $1
-               OR items LIKE $1
-            ORDER BY created_at DESC
+               OR items LIKE $1)
+              AND ($3::timestamp IS NULL OR (created_at, id) < ($3, $4::int))
+            ORDER BY created_at DESC, id DESC
             LIMIT $2
-        """, search_term, limit)
+        """, search_term, limit, *parse_order_cursor(cursor))
         return [dict(row) for row in rows]
 
 
@@ -960,12 +1296,31 @@ async def set_active_business(business_id: int, organization_id: int = None):
             await conn.execute("UPDATE businesses SET is_active = true WHERE id = $1", business_id)
 
 
+# Business columns that may be written through the API
+BUSINESS_FIELDS = ['name', 'type', 'greeting', 'assistant_name', 'system_prompt',
+                   'menu_reference', 'phone_number', 'email', 'address', 'config_json', 'voice']
+
+
+def _config_json_value(value):
+    """Accept config_json as JSON text from older clients; it is stored as JSONB."""
+    if isinstance(value, str):
+        return json.loads(value) if value else None
+    return value
+
+
+def _business_values(row: Dict) -> list:
+    """Values for BUSINESS_FIELDS in column order."""
+    return [
+        _config_json_value(row.get(key)) if key == 'config_json' else row.get(key)
+        for key in BUSINESS_FIELDS
+    ]
+
+
 async def update_business(business_id: int, updates: Dict):
     """Update business configuration."""
     pool = await get_pool()
     async with pool.acquire() as conn:
-        allowed_keys = ['name', 'type', 'greeting', 'assistant_name', 'system_prompt', 
-                       'menu_reference', 'phone_number', 'email', 'address', 'config_json', 'voice']
+        allowed_keys = BUSINESS_FIELDS
         
         # Build update query dynamically
         set_clauses = []
@@ -974,6 +1329,8 @@ async def update_business(business_id: int, updates: Dict):
         
         for key, value in updates.items():
             if key in allowed_keys:
+                if key == 'config_json':
+                    value = _config_json_value(value)
                 set_clauses.append(f"{key} = ${param_num}")
                 values.append(value)
                 param_num += 1
@@ -992,6 +1349,47 @@ async def update_business(business_id: int, updates: Dict):
             await conn.execute(query, *values)
 
 
+async def upsert_businesses(rows: List[Dict]):
+    """Insert or update many businesses in one transaction.
+
+    Rows with an "id" update that business; keys missing from the row are left
+    unchanged. Rows without an "id" are inserted and need "organization_id",
+    "name" and "type".
+    """
+    if not rows:
+        return
+    updates = [row for row in rows if row.get("id")]
+    inserts = [row for row in rows if not row.get("id")]
+    
+    pool = await get_pool()
+    async with pool.acquire() as conn:
+        async with conn.transaction():
+            if updates:
+                set_clauses = [f"{key} = COALESCE(${i + 2}, {key})" for i, key in enumerate(BUSINESS_FIELDS)]
+                set_clauses.append(f"updated_at = ${len(BUSINESS_FIELDS) + 2}")
+                now = datetime.now()
+                await conn.executemany(
+                    f"UPDATE businesses SET {', '.join(set_clauses)} WHERE id = $1",
+                    [
+                        (row["id"], *_business_values(row), now)
+                        for row in updates
+                    ]
+                )
+            
+            if inserts:
+                columns = ['organization_id', 'is_active'] + BUSINESS_FIELDS
+                placeholders = [f"${i + 1}" for i in range(len(columns))]
+                # Keep the column default voice when none is given
+                placeholders[columns.index('voice')] = f"COALESCE(${columns.index('voice') + 1}, 'Polly.Matthew-Neural')"
+                await conn.executemany(
+                    f"INSERT INTO businesses ({', '.join(columns)}) VALUES ({', '.join(placeholders)})",
+                    [
+                        (row["organization_id"], bool(row.get("is_active", False)), *_business_values(row))
+                        for row in inserts
+                    ]
+                )
+
+
 async def get_business(business_id: int) -> Optional[Dict]:
     """Get a specific business."""
     pool = await get_pool()
@@ -1007,13 +1405,13 @@ async def delete_business(business_id: int):
         await conn.execute("DELETE FROM businesses WHERE id = $1", business_id)
 
 
-async def delete_businesses_by_assistant_name(assistant_name: str):
-    """Delete all businesses with a specific assistant name."""
+async def delete_businesses_by_assistant_name(assistant_name: str) -> int:
+    """Delete all businesses with a specific assistant name and return how many were removed."""
     pool = await get_pool()
     async with pool.acquire() as conn:
-        # First, deactivate if any are active
-        await conn.execute("UPDATE businesses SET is_active = false WHERE assistant_name = $1", assistant_name)
-        # Then delete
-        await conn.execute("DELETE FROM businesses WHERE assistant_name = $1", assistant_name)
-        # Return count of deleted businesses
-        return await conn.fetchval("SELECT COUNT(*) FROM businesses WHERE assistant_name = $1", assistant_name)
+        # Single round-trip; RETURNING gives us the deleted rows to count
+        rows = await conn.fetch(
+            "DELETE FROM businesses WHERE assistant_name = $1 RETURNING id",
+            assistant_name
+        )
+        return len(rows)
@@ -0,0 +1,56 @@
+"""
+Re-extract order information from stored call transcripts using the
+OpenAI Batch API (for nightly cron jobs; not used on live calls).
+
+Usage: python extract_orders.py [--days 1] [--output orders.jsonl]
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import sys
+from datetime import datetime, timedelta
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+from database import get_call_transcripts, close_pool
+from utils import extract_order_info_batch, close_openai_client
+
+
+async def run(days: float, output: str = None):
+    transcripts = await get_call_transcripts(datetime.now() - timedelta(days=days))
+    call_sids = list(transcripts)
+    if not call_sids:
+        logging.info("No calls to extract")
+        return
+
+    results = await extract_order_info_batch([transcripts[sid] for sid in call_sids])
+
+    out = open(output, "w") if output else sys.stdout
+    try:
+        for call_sid, order_info in zip(call_sids, results):
+            out.write(json.dumps({"call_sid": call_sid, "order_info": order_info}) + "\n")
+    finally:
+        if output:
+            out.close()
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Batch re-extract orders from stored call transcripts")
+    parser.add_argument("--days", type=float, default=1, help="Extract calls from the last N days (default 1)")
+    parser.add_argument("--output", help="Write JSONL results to this file instead of stdout")
+    args = parser.parse_args()
+
+    try:
+        await run(args.days, args.output)
+    finally:
+        await close_openai_client()
+        await close_pool()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main())
@@ -0,0 +1,127 @@
+"""
+Exact-match cache for LLM completions.
+
+Identical requests (same model, messages and sampling settings) return the
+stored completion instead of calling the API again, e.g. when a webhook is
+redelivered and the same conversation is extracted twice.
+"""
+import os
+import json
+import hashlib
+import logging
+from typing import Awaitable, Callable, Optional, Protocol
+from cachetools import TTLCache
+
+logger = logging.getLogger(__name__)
+
+LLM_CACHE_TTL_SECONDS = 3600
+
+
+class CacheBackend(Protocol):
+    async def get(self, key: str) -> Optional[str]: ...
+    async def set(self, key: str, value: str, ttl: int) -> None: ...
+
+
+class MemoryBackend:
+    """In-process backend (per worker)."""
+
+    def __init__(self, maxsize: int = 1024, ttl: int = LLM_CACHE_TTL_SECONDS):
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    async def get(self, key: str) -> Optional[str]:
+        return self._cache.get(key)
+
+    async def set(self, key: str, value: str, ttl: int) -> None:
+        self._cache[key] = value
+
+
+class RedisBackend:
+    """Redis backend, shared by every worker/instance."""
+
+    def __init__(self, redis):
+        self._redis = redis
+
+    async def get(self, key: str) -> Optional[str]:
+        return await self._redis.get(key)
+
+    async def set(self, key: str, value: str, ttl: int) -> None:
+        await self._redis.set(key, value, ex=ttl)
+
+    async def close(self) -> None:
+        await self._redis.aclose()
+
+
+class LLMCache:
+    """Completion cache keyed by a SHA-256 of the request parameters."""
+
+    def __init__(self, backend: CacheBackend, ttl: int = LLM_CACHE_TTL_SECONDS,
+                 prefix: str = "llm:", log_every: int = 100):
+        self.backend = backend
+        self.ttl = ttl
+        self.prefix = prefix
+        self.log_every = log_every
+        self.hits = 0
+        self.misses = 0
+
+    def cache_key(self, request: dict) -> str:
+        payload = json.dumps(request, sort_keys=True, separators=(",", ":"))
+        return self.prefix + hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    async def get(self, request: dict) -> Optional[str]:
+        return await self.backend.get(self.cache_key(request))
+
+    async def set(self, request: dict, value: str) -> None:
+        await self.backend.set(self.cache_key(request), value, self.ttl)
+
+    async def get_or_compute(self, request: dict, compute: Callable[[], Awaitable[str]]) -> str:
+        """Return the cached completion for request, or compute and store it."""
+        key = self.cache_key(request)
+        try:
+            cached = await self.backend.get(key)
+        except Exception as e:
+            logger.warning("LLM cache read failed: %s", e)
+            cached = None
+
+        if cached is not None:
+            self.hits += 1
+            self._log_stats()
+            return cached
+
+        self.misses += 1
+        self._log_stats()
+        value = await compute()
+        try:
+            await self.backend.set(key, value, self.ttl)
+        except Exception as e:
+            logger.warning("LLM cache write failed: %s", e)
+        return value
+
+    def _log_stats(self):
+        total = self.hits + self.misses
+        if total % self.log_every == 0:
+            logger.info("LLM cache hit rate %.1f%% (%d/%d)", 100 * self.hits / total, self.hits, total)
+
+
+_cache = None
+
+
+def get_llm_cache() -> LLMCache:
+    """Get or create the shared cache (Redis-backed when REDIS_URL is set)."""
+    global _cache
+    if _cache is None:
+        redis_url = os.getenv("REDIS_URL")
+        if redis_url:
+            import redis.asyncio as redis
+            backend = RedisBackend(redis.from_url(redis_url, decode_responses=True))
+        else:
+            backend = MemoryBackend()
+        _cache = LLMCache(backend)
+    return _cache
+
+
+async def close_llm_cache():
+    """Close the cache's Redis connection, if any."""
+    global _cache
+    if _cache is not None and isinstance(_cache.backend, RedisBackend):
+        await _cache.backend.close()
+    _cache = None
@@ -4,18 +4,28 @@ Handles Twilio webhooks and manages call flow.
 """
 
 import os
+import asyncio
 import logging
-from fastapi import FastAPI, Request, Form, Query, HTTPException, Depends, status
-from fastapi.responses import Response, FileResponse, StreamingResponse
+from fastapi import FastAPI, Request, Form, Query, HTTPException, Depends, BackgroundTasks, status
+from fastapi.responses import Response, StreamingResponse, ORJSONResponse
 from fastapi.staticfiles import StaticFiles
+from fastapi.security import HTTPAuthorizationCredentials
+from fastapi.encoders import jsonable_encoder
 from twilio.twiml.voice_response import VoiceResponse, Gather, Dial
 from twilio.request_validator import RequestValidator
 from dotenv import load_dotenv
 from typing import Optional
+from cachetools import TTLCache
 import json
+import hashlib
+import orjson
 import csv
 import io
+import re
+import time
+from dataclasses import dataclass
 from datetime import datetime
+from xml.sax.saxutils import escape
 
 # Configure logging
 logging.basicConfig(
@@ -24,24 +34,34 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-from prompts import check_for_emergency, ORDER_QUESTIONS, get_business_prompt
-from utils import generate_response, extract_order_info, save_order_simple
+from prompts import (
+    check_for_emergency, ORDER_QUESTIONS, get_business_prompt, set_active_business_cache, cache_business_prompt
+)
+from utils import (
+    generate_response, extract_order_info, summarize_conversation, send_order_email,
+    ORDER_PLACED_SUMMARY, HISTORY_WINDOW, SUMMARY_EVERY_TURNS, close_openai_client
+)
 from database import (
-    init_db, save_call_start, save_call_end, save_conversation_turn,
+    LONG_RUNNING_SERVER, init_db, get_pool, close_pool, save_call_start, save_call_end, queue_conversation_turn, flush_conversation_turns,
     save_appointment, save_order, mark_call_emergency, get_recent_calls, get_call_details,
     get_statistics, get_appointments, update_appointment_status, get_chart_data,
-    search_calls, search_appointments, get_all_calls_for_export,
-    get_all_appointments_for_export,
-    get_orders, get_order, update_order_status, get_order_statistics, search_orders,
+    search_calls, search_appointments, iter_calls_for_export,
+    iter_appointments_for_export, iter_orders_for_export,
+    get_orders, get_order, make_order_cursor, parse_order_cursor, update_order_status, update_order_statuses, get_order_statistics, search_orders,
     get_active_business, get_all_businesses, set_active_business, update_business, get_business,
-    delete_business, delete_businesses_by_assistant_name
+    delete_business, delete_businesses_by_assistant_name, init_default_businesses_for_org
 )
 from auth import (
-    authenticate_user, create_access_token, get_current_user, get_current_organization,
-    get_password_hash, ACCESS_TOKEN_EXPIRE_MINUTES
+    authenticate_user, create_access_token, get_current_user, get_current_organization, get_user_by_email,
+    get_password_hash, invalidate_token, security, ACCESS_TOKEN_EXPIRE_MINUTES
 )
 from datetime import timedelta
-from organizations import create_organization, create_user, get_organization, get_organization_users, get_organization_by_phone
+from pos_integration import close_pos_client
+from llm_cache import close_llm_cache
+from organizations import (
+    create_organization, create_user, get_organization, get_organization_users, get_organization_by_phone,
+    invalidate_organization_caches
+)
 from pydantic import BaseModel, EmailStr
 
 # Load environment variables
@@ -50,7 +70,8 @@ load_dotenv()
 app = FastAPI(
     title="AI Phone Receptionist SaaS",
     version="2.0.0",
-    description="Multi-tenant B2B SaaS platform for AI-powered phone receptionists"
+    description="Multi-tenant B2B SaaS platform for AI-powered phone receptionists",
+    default_response_class=ORJSONResponse
 )
 
 # Initialize database on startup
@@ -64,25 +85,38 @@ async def ensure_db_initialized():
     if not _db_initialized:
         try:
             # Initialize database connection pool first
-            from database import get_pool
-            pool = await get_pool()
+            await get_pool()
             logger.info("Database pool created successfully")
             await init_db()
             logger.info("Database tables initialized")
-            from prompts import load_active_business
-            await load_active_business()
-            logger.info("Active business loaded")
             _db_initialized = True
         except Exception as e:
-            logger.error(f"Database init error: {e}")
-            import traceback
-            logger.error(traceback.format_exc())
+            logger.error(f"Database init error: {e}", exc_info=True)
             # Don't re-raise here - let endpoints handle it
 
 @app.on_event("startup")
 async def startup():
     """Startup event - may not run on Vercel, so we also check on requests."""
+    # Duplicate routes are dead code that still lengthens the per-request route scan
+    route_keys = [(r.path, frozenset(getattr(r, "methods", None) or ())) for r in app.routes]
+    assert len(set(route_keys)) == len(route_keys), "Duplicate route registered"
     await ensure_db_initialized()
+    if LONG_RUNNING_SERVER:
+        # Pick up mail left queued by a previous process without waiting for a new order
+        _ensure_mail_worker()
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    """Release shared clients."""
+    await flush_conversation_turns()
+    await flush_mail_queue()
+    await close_pool()
+    await close_openai_client()
+    await close_pos_client()
+    await close_llm_cache()
+    if _redis is not None:
+        await _redis.aclose()
 
 # Serve static files (frontend)
 # On Vercel, static files are served automatically, but we keep this for local dev
@@ -96,24 +130,324 @@ OFFICE_PHONE = os.getenv("OFFICE_PHONE_NUMBER")
 TWILIO_AUTH_TOKEN = os.getenv("TWILIO_AUTH_TOKEN")
 BASE_URL = os.getenv("BASE_URL", "https://your-domain.com")
 
-# In-memory call state (use Redis in production)
+# Pre-rendered TwiML for the common /process turn: gather speech while saying
+# the reply, then a fallback prompt and redirect back to /process
+_GATHER_TWIML = (
+    '<?xml version="1.0" encoding="UTF-8"?>'
+    '<Response>'
+    '<Gather action="{action}" input="speech" language="en-US" method="POST" speechTimeout="auto" timeout="5">'
+    '<Say voice="{voice}">{say}</Say>'
+    '</Gather>'
+    '<Say voice="{voice}">I didn\'t catch that. Could you please repeat?</Say>'
+    '<Redirect method="POST">{action}</Redirect>'
+    '</Response>'
+)
+_PROCESS_URL = escape(f"{BASE_URL}/process", {'"': "&quot;"})
+
+
+def gather_twiml(say: str, voice: str) -> Response:
+    """TwiML response that says text and gathers the caller's next reply."""
+    xml = _GATHER_TWIML.format(
+        action=_PROCESS_URL,
+        voice=escape(voice, {'"': "&quot;"}),
+        say=escape(say)
+    )
+    return Response(content=xml, media_type="application/xml")
+
+
+_twilio_validator = RequestValidator(TWILIO_AUTH_TOKEN) if TWILIO_AUTH_TOKEN else None
+
+
+async def verify_twilio_signature(request: Request):
+    """Reject webhook calls not signed by Twilio before any DB/LLM work is done."""
+    if _twilio_validator is None:
+        return  # TWILIO_AUTH_TOKEN not set (local development)
+    
+    # Twilio signs the public URL it called, which is under BASE_URL (the app
+    # may see a different scheme/host behind the proxy)
+    url = f"{BASE_URL}{request.url.path}"
+    if request.url.query:
+        url += f"?{request.url.query}"
+    # Starlette caches the parsed form on the request, so handlers don't re-parse it
+    form = await request.form()
+    signature = request.headers.get("X-Twilio-Signature", "")
+    if not _twilio_validator.validate(url, dict(form), signature):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Invalid Twilio signature")
+
+# Phrases that end the call once the order is saved (substring match)
+END_CALL_PHRASES = [
+    "no", "no thanks", "nothing else", "that's all", "no that's it", "goodbye", "bye",
+    "that's everything", "yes that's correct", "yes that's right", "correct", "that's correct"
+]
+_END_CALL_RE = re.compile("|".join(map(re.escape, END_CALL_PHRASES)))
+
+# Call session store. With REDIS_URL set, sessions live in Redis so any
+# worker/instance can handle a call's webhooks; otherwise in-process memory.
+REDIS_URL = os.getenv("REDIS_URL")
+SESSION_TTL_SECONDS = 1800
+# Turns kept in the session; older context lives on in session["summary"]
+HISTORY_MAX_TURNS = 32
+
 call_sessions = {}
+_redis = None
 
 
-def get_call_session(call_sid: str) -> dict:
-    """Get or create call session."""
-    if call_sid not in call_sessions:
-        call_sessions[call_sid] = {
-            "conversation_history": [],
-            "questions_asked": 0,
-            "appointment_info": {},
-            "is_emergency": False,
-            "caller_phone": None
-        }
-    return call_sessions[call_sid]
+DEFAULT_VOICE = "Polly.Matthew-Neural"
+OFFICE_NAME = os.getenv("OFFICE_NAME", "Nunzio's Pizza")
+
+
+@dataclass(slots=True, frozen=True)
+class BusinessCfg:
+    """Call-handling settings of an organization's active business, defaults applied."""
+    id: Optional[int]
+    voice: str
+    greeting: str
+    system_prompt: Optional[str]
+    business: Optional[dict]  # Raw row, for the prompts module cache; don't mutate
+
+
+def _business_cfg(business: Optional[dict]) -> BusinessCfg:
+    if not business:
+        return BusinessCfg(
+            id=None,
+            voice=DEFAULT_VOICE,
+            greeting=f"Thank you for calling {OFFICE_NAME}! This is John. How can I help you today?",
+            system_prompt=None,
+            business=None
+        )
+    return BusinessCfg(
+        id=business.get("id"),
+        voice=business.get("voice") or DEFAULT_VOICE,
+        greeting=business.get("greeting") or "Thank you for calling! How can I help you today?",
+        system_prompt=business.get("system_prompt"),
+        business=dict(business)
+    )
+
+
+# Active business config per organization; short TTL bounds staleness across workers
+_business_cache = TTLCache(maxsize=1024, ttl=60)
+
+
+async def get_active_business_cfg(organization_id: int = None) -> BusinessCfg:
+    """Active business settings for an organization, via a per-organization TTL cache."""
+    cfg = _business_cache.get(organization_id)
+    if cfg is None:
+        business = await get_active_business(organization_id)
+        cache_business_prompt(business)
+        cfg = _business_cfg(business)
+        _business_cache[organization_id] = cfg
+    return cfg
+
+
+def _invalidate_business_caches():
+    """Drop cached business lookups after a business is changed."""
+    _business_cache.clear()
+    invalidate_organization_caches()
+
+
+def get_redis():
+    """Get or create the Redis client (None when REDIS_URL isn't set)."""
+    global _redis
+    if _redis is None and REDIS_URL:
+        import redis.asyncio as redis
+        _redis = redis.from_url(REDIS_URL, decode_responses=True)
+    return _redis
+
+
+def _new_call_session() -> dict:
+    return {
+        "conversation_history": [],
+        "questions_asked": 0,
+        "appointment_info": {},
+        "is_emergency": False,
+        "caller_phone": None
+    }
+
+
+# Session fields each writer owns. /process and the background order task
+# run concurrently for a call, so each saves only its own fields; saving the
+# whole session would overwrite the other's updates with stale values.
+TURN_FIELDS = ("conversation_history", "turn_count", "caller_phone", "organization_id")
+ORDER_FIELDS = ("order_info", "order_saved", "order_id", "summary", "summarized_upto")
+
+# Sessions are Redis hashes of JSON-encoded fields. ARGV: ttl, create flag,
+# then field/value pairs; without the create flag a deleted session stays deleted.
+_UPDATE_SESSION_LUA = """
+if ARGV[2] == '0' and redis.call('EXISTS', KEYS[1]) == 0 then return 0 end
+redis.call('HSET', KEYS[1], unpack(ARGV, 3))
+redis.call('EXPIRE', KEYS[1], ARGV[1])
+return 1
+"""
+
+
+def _session_key(call_sid: str) -> str:
+    return f"call:{call_sid}:session"
+
+
+async def get_call_session(call_sid: str, create: bool = True) -> Optional[dict]:
+    """Get call session, creating a new one if missing (unless create=False)."""
+    redis = get_redis()
+    if redis is None:
+        if call_sid not in call_sessions:
+            if not create:
+                return None
+            call_sessions[call_sid] = _new_call_session()
+        return call_sessions[call_sid]
+    
+    raw = await redis.hgetall(_session_key(call_sid))
+    if raw:
+        return {field: json.loads(value) for field, value in raw.items()}
+    return _new_call_session() if create else None
+
+
+async def save_call_session(call_sid: str, session: dict, fields: tuple = None, create: bool = True):
+    """Persist call session fields (all by default; values must be JSON-serializable).
+
+    With create=False nothing is written if the session no longer exists,
+    e.g. because the call ended while a background task was running.
+    """
+    if fields is None:
+        fields = tuple(session)
+    redis = get_redis()
+    if redis is None:
+        stored = call_sessions.get(call_sid)
+        if stored is None:
+            if not create:
+                return
+            stored = call_sessions[call_sid] = {}
+        if stored is not session:
+            stored.update({field: session[field] for field in fields if field in session})
+        return
+    
+    args = [SESSION_TTL_SECONDS, int(create)]
+    for field in fields:
+        if field in session:
+            args += [field, json.dumps(session[field])]
+    if len(args) > 2:
+        await redis.eval(_UPDATE_SESSION_LUA, 1, _session_key(call_sid), *args)
+
+
+async def delete_call_session(call_sid: str):
+    """Remove call session once the call has ended."""
+    redis = get_redis()
+    if redis is None:
+        call_sessions.pop(call_sid, None)
+        return
+    await redis.delete(_session_key(call_sid))
+
+
+# Calls whose first order email has been claimed, so overlapping background
+# work for one call (back-to-back turns, hangup) sends it only once
+_order_email_claims = TTLCache(maxsize=10000, ttl=SESSION_TTL_SECONDS)
+
+
+async def claim_order_email(call_sid: str) -> bool:
+    """Atomically claim a call's first order email; True only for the first claim."""
+    redis = get_redis()
+    if redis is None:
+        if call_sid in _order_email_claims:
+            return False
+        _order_email_claims[call_sid] = True
+        return True
+    return bool(await redis.set(f"call:{call_sid}:order_claimed", 1, nx=True, ex=SESSION_TTL_SECONDS))
+
+
+# On a long-running server, outgoing order emails are queued here and sent by
+# one background worker, so SMTP never holds up call handling. With Redis the
+# queue is a list and a job stays in the processing list until it is sent, so
+# mail queued (or mid-send) before a restart is still sent when the next
+# worker starts. On serverless nothing runs after the invocation returns, so
+# emails are sent (from background tasks) before it does.
+MAIL_QUEUE_KEY = "mail:orders"
+MAIL_PROCESSING_KEY = "mail:orders:processing"
+_mail_q: Optional[asyncio.Queue] = None
+_mail_worker = None
+_mail_inflight = None
+
+
+async def queue_order_email(caller_phone: str, order_info: dict, conversation_summary: Optional[str] = None):
+    """Queue an order email (send it right away on serverless)."""
+    job = {
+        "caller_phone": caller_phone,
+        "order_info": order_info,
+        "conversation_summary": conversation_summary
+    }
+    if not LONG_RUNNING_SERVER:
+        await _send_mail_job(job)
+        return
+    _ensure_mail_worker()
+    redis = get_redis()
+    if redis is None:
+        _mail_q.put_nowait(job)
+    else:
+        await redis.lpush(MAIL_QUEUE_KEY, json.dumps(job))
+
 
+def _ensure_mail_worker():
+    """Start the mail worker if it isn't running (startup doesn't run on Vercel)."""
+    global _mail_q, _mail_worker
+    if _mail_q is None:
+        _mail_q = asyncio.Queue()
+    if _mail_worker is None or _mail_worker.done():
+        _mail_worker = asyncio.create_task(_send_queued_mail())
 
-@app.post("/answer")
+
+async def _send_mail_job(job: dict):
+    """Send a queued email, waiting for SMTP in a thread."""
+    summary = job.get("conversation_summary")
+    try:
+        await send_order_email(
+            job["caller_phone"], job["order_info"],
+            ORDER_PLACED_SUMMARY if summary is None else summary
+        )
+    except Exception:
+        logger.exception("Error sending order email")
+
+
+async def _deliver_mail_job(job: dict, raw: Optional[str] = None):
+    """Send one job, then drop it from the Redis processing list."""
+    await _send_mail_job(job)
+    if raw is not None:
+        await get_redis().lrem(MAIL_PROCESSING_KEY, 1, raw)
+
+
+async def _send_queued_mail():
+    """Send queued order emails one at a time."""
+    global _mail_inflight
+    redis = get_redis()
+    if redis is not None:
+        # Jobs a previous worker took but never finished sending
+        while await redis.lmove(MAIL_PROCESSING_KEY, MAIL_QUEUE_KEY, "RIGHT", "RIGHT") is not None:
+            pass
+    while True:
+        raw = None
+        if redis is None:
+            job = await _mail_q.get()
+        else:
+            raw = await redis.blmove(MAIL_QUEUE_KEY, MAIL_PROCESSING_KEY, 5, "RIGHT", "LEFT")
+            if raw is None:
+                continue
+            job = json.loads(raw)
+        # Shielded so stopping the worker never cuts off a send in progress
+        _mail_inflight = asyncio.create_task(_deliver_mail_job(job, raw))
+        await asyncio.shield(_mail_inflight)
+        _mail_inflight = None
+
+
+async def flush_mail_queue():
+    """Stop the mail worker, finishing its current send and anything still queued in-process."""
+    global _mail_worker, _mail_inflight
+    if _mail_worker is not None:
+        _mail_worker.cancel()
+        _mail_worker = None
+    if _mail_inflight is not None:
+        await _mail_inflight
+        _mail_inflight = None
+    while _mail_q is not None and not _mail_q.empty():
+        await _send_mail_job(_mail_q.get_nowait())
+
+
+@app.post("/answer", dependencies=[Depends(verify_twilio_signature)])
 async def answer_call(request: Request):
     """
     Twilio webhook: Called when a call comes in.
@@ -129,24 +463,22 @@ async def answer_call(request: Request):
     # For now, use default organization or find by phone number
     organization_id = await get_organization_by_phone(called_number)
     
-    # Save call to database
-    await save_call_start(call_sid, caller_phone, organization_id)
-    
-    # Initialize call session
-    session = get_call_session(call_sid)
+    # Initialize call session (epoch seconds: JSON-safe and valid on any worker)
+    session = await get_call_session(call_sid)
     session["caller_phone"] = caller_phone
-    session["start_time"] = datetime.now()
+    session["start_ts"] = time.time()
+    session["organization_id"] = organization_id
     
-    response = VoiceResponse()
+    # Save the call, store the session and load the business config concurrently
+    _, _, cfg = await asyncio.gather(
+        save_call_start(call_sid, caller_phone, organization_id),
+        save_call_session(call_sid, session),
+        get_active_business_cfg(organization_id),
+    )
     
-    # Get active business configuration for this organization
-    business = await get_active_business(organization_id)
-    if business:
-        greeting = business.get("greeting", "Thank you for calling! How can I help you today?")
-        voice = business.get("voice", "Polly.Matthew-Neural")  # Default voice
-    else:
-        greeting = f"Thank you for calling {os.getenv('OFFICE_NAME', 'Nunzio\'s Pizza')}! This is John. How can I help you today?"
-        voice = "Polly.Matthew-Neural"
+    response = VoiceResponse()
+    greeting = cfg.greeting
+    voice = cfg.voice
     
     gather = Gather(
         input="speech",
@@ -167,8 +499,73 @@ async def answer_call(request: Request):
     return Response(content=str(response), media_type="application/xml")
 
 
-@app.post("/process")
-async def process_speech(request: Request):
+async def _persist_turn(call_sid: str, caller_phone: str, organization_id: Optional[int], summarize: bool = False):
+    """Extract order info from the conversation so far and save it.
+
+    Runs as a background task after the TwiML response has been sent.
+    With summarize=True, also refreshes the rolling summary of turns that
+    have fallen out of the LLM's recent window.
+    """
+    session = await get_call_session(call_sid, create=False)
+    if not session:
+        return  # Call already ended; /hangup does the final save
+    
+    history = session["conversation_history"]
+    try:
+        if summarize:
+            # Summarize only turns the previous summary doesn't cover yet.
+            # summarized_upto counts turns from the start of the call, since
+            # history itself is trimmed to HISTORY_MAX_TURNS.
+            previous_summary = session.get("summary")
+            summarized_upto = session.get("summarized_upto", 0)
+            first_turn = session.get("turn_count", len(history)) - len(history)
+            new_turns = history[max(summarized_upto - first_turn, 0):-HISTORY_WINDOW]
+            
+            # Extraction keeps enough recent turns to pair with the previous
+            # summary, so it runs alongside the refresh instead of after it
+            summary, order_info = await asyncio.gather(
+                summarize_conversation(new_turns, previous_summary),
+                extract_order_info(history, previous_summary)
+            )
+            # summarize_conversation hands back the previous summary on failure
+            if new_turns and summary is not previous_summary:
+                session["summary"] = summary
+                session["summarized_upto"] = first_turn + len(history) - HISTORY_WINDOW
+        else:
+            order_info = await extract_order_info(history, session.get("summary"))
+        session["order_info"] = order_info
+        logger.info(f"Extracted order info for call {call_sid}: {order_info}")
+        
+        # Check if we have items (most important) - more lenient check
+        items_str = str(order_info.get("items", "") or "")
+        has_items = items_str and items_str.lower() not in ["null", "none", ""] and len(items_str.strip()) > 2
+        
+        # MORE ROBUST: Save order whenever we detect items, even if already saved (updates)
+        if has_items:
+            try:
+                # Always save/update order if we have items
+                order_id = await save_order(call_sid, caller_phone, order_info, organization_id)
+                logger.info(f"Order saved/updated in database with ID {order_id} for call {call_sid}")
+                
+                # Mark as saved
+                if not session.get("order_saved"):
+                    session["order_saved"] = True
+                    session["order_id"] = order_id
+                    # Send email on first save; the claim stops an overlapping
+                    # turn or the hangup task from sending it too
+                    if await claim_order_email(call_sid):
+                        await queue_order_email(caller_phone, order_info)
+            except Exception as e:
+                logger.error(f"Error saving order to database: {e}", exc_info=True)
+                # Continue conversation even if save fails
+    except Exception as e:
+        logger.error(f"Error extracting order info: {e}", exc_info=True)
+    
+    await save_call_session(call_sid, session, ORDER_FIELDS, create=False)
+
+
+@app.post("/process", dependencies=[Depends(verify_twilio_signature)])
+async def process_speech(request: Request, background: BackgroundTasks):
     """
     Process caller's speech input and generate response.
     """
@@ -182,41 +579,14 @@ async def process_speech(request: Request):
     if not call_sid:
         response = VoiceResponse()
         # Get voice from business
-        business = await get_active_business()
-        voice = business.get("voice", "Polly.Matthew-Neural") if business else "Polly.Matthew-Neural"
-        response.say("I'm sorry, there was an error. Please call back.", voice=voice)
+        cfg = await get_active_business_cfg()
+        response.say("I'm sorry, there was an error. Please call back.", voice=cfg.voice)
         response.hangup()
         return Response(content=str(response), media_type="application/xml")
     
-    session = get_call_session(call_sid)
+    session = await get_call_session(call_sid)
     session["caller_phone"] = caller_phone
     
-    response = VoiceResponse()
-    
-    # Handle empty input - might be timeout or no speech detected
-    if not user_input:
-        logger.warning(f"Empty speech input for call {call_sid}")
-        gather = Gather(
-            input="speech",
-            action=f"{BASE_URL}/process",
-            method="POST",
-            timeout=5,
-            speech_timeout="auto",
-            language="en-US"
-        )
-        # Get voice from business
-        business = await get_active_business()
-        voice = business.get("voice", "Polly.Matthew-Neural") if business else "Polly.Matthew-Neural"
-        gather.say("I'm sorry, I didn't catch that. Could you please repeat?", voice=voice)
-        response.append(gather)
-        response.say("I didn't catch that. Could you please repeat?", voice=voice)
-        response.redirect(f"{BASE_URL}/process", method="POST")
-        return Response(content=str(response), media_type="application/xml")
-    
-    # Add user input to conversation history
-    session["conversation_history"].append({"user": user_input, "assistant": ""})
-    turn_number = len(session["conversation_history"])
-    
     # Get organization from call (stored in session or from phone number)
     organization_id = session.get("organization_id")
     if not organization_id:
@@ -225,66 +595,56 @@ async def process_speech(request: Request):
         if organization_id:
             session["organization_id"] = organization_id
     
-    # Get active business for prompt
-    business = await get_active_business(organization_id)
-    system_prompt = None
-    if business:
-        system_prompt = business.get("system_prompt")
-        # Update cache
-        from prompts import _active_business_cache
-        _active_business_cache = dict(business)
+    # Resolve the active business once for this turn
+    cfg = await get_active_business_cfg(organization_id)
+    voice = cfg.voice
+    
+    # Handle empty input - might be timeout or no speech detected
+    if not user_input:
+        logger.warning(f"Empty speech input for call {call_sid}")
+        await save_call_session(call_sid, session, TURN_FIELDS)
+        return gather_twiml("I'm sorry, I didn't catch that. Could you please repeat?", voice)
+    
+    # Lowercased once per turn for the keyword checks below
+    user_lower = user_input.lower()
+    
+    # Add user input to conversation history
+    history = session["conversation_history"]
+    history.append({"user": user_input, "assistant": ""})
+    if len(history) > HISTORY_MAX_TURNS:
+        del history[:-HISTORY_MAX_TURNS]
+    turn_number = session["turn_count"] = session.get("turn_count", 0) + 1
+    
+    if cfg.business:
+        set_active_business_cache(cfg.business)
     
     # Generate AI response first (before creating response)
-    ai_response = generate_response(
+    ai_response = await generate_response(
         user_input=user_input,
-        conversation_history=session["conversation_history"][:-1],  # Exclude current turn
-        system_prompt=system_prompt
+        conversation_history=history[-HISTORY_WINDOW - 1:-1],  # Recent turns, excluding current
+        system_prompt=cfg.system_prompt,
+        summary=session.get("summary")
     )
     
     # Add AI response to history
-    session["conversation_history"][-1]["assistant"] = ai_response
+    history[-1]["assistant"] = ai_response
     
-    # Save conversation turn to database
-    await save_conversation_turn(call_sid, user_input, ai_response, turn_number)
+    # Save conversation turn to database (batched in the background on a long-running server)
+    await queue_conversation_turn(call_sid, user_input, ai_response, turn_number)
     
-    # Extract and save order info (run less frequently for speed - every 3+ turns to reduce API calls)
-    if len(session["conversation_history"]) >= 3:
-        try:
-            order_info = extract_order_info(session["conversation_history"])
-            session["order_info"] = order_info
-            logger.info(f"Extracted order info for call {call_sid}: {order_info}")
-            
-            # Check if we have items (most important) - more lenient check
-            items_str = str(order_info.get("items", "") or "")
-            has_items = items_str and items_str.lower() not in ["null", "none", ""] and len(items_str.strip()) > 2
-            
-            # MORE ROBUST: Save order whenever we detect items, even if already saved (updates)
-            if has_items:
-                try:
-                    # Always save/update order if we have items
-                    order_id = await save_order(call_sid, caller_phone, order_info, organization_id)
-                    logger.info(f"Order saved/updated in database with ID {order_id} for call {call_sid}")
-                    
-                    # Mark as saved
-                    if not session.get("order_saved"):
-                        session["order_saved"] = True
-                        session["order_id"] = order_id
-                        # Send email on first save
-                        save_order_simple(order_info, caller_phone)
-                except Exception as e:
-                    logger.error(f"Error saving order to database: {e}", exc_info=True)
-                    # Continue conversation even if save fails
-        except Exception as e:
-            logger.error(f"Error extracting order info: {e}", exc_info=True)
+    # Extract and save order info after responding (every 3+ turns to reduce API calls)
+    if turn_number >= 3:
+        background.add_task(
+            _persist_turn, call_sid, caller_phone, organization_id,
+            summarize=turn_number % SUMMARY_EVERY_TURNS == 0
+        )
+    
+    await save_call_session(call_sid, session, TURN_FIELDS)
     
     # Check if caller wants to end the call
-    user_lower = user_input.lower()
-    end_call_phrases = ["no", "no thanks", "nothing else", "that's all", "no that's it", "goodbye", "bye", "that's everything", "yes that's correct", "yes that's right", "correct", "that's correct"]
-    if any(phrase in user_lower for phrase in end_call_phrases) and session.get("order_saved"):
+    if session.get("order_saved") and _END_CALL_RE.search(user_lower):
         # Final closing message
-        # Get voice from business
-        business = await get_active_business()
-        voice = business.get("voice", "Polly.Matthew-Neural") if business else "Polly.Matthew-Neural"
+        response = VoiceResponse()
         response.say(
             "Perfect! Your order is all set. Thank you for calling! Have a great day!",
             voice=voice
@@ -293,33 +653,56 @@ async def process_speech(request: Request):
         return Response(content=str(response), media_type="application/xml")
     
     # Speak the response immediately (removed processing delay for speed)
-    gather = Gather(
-        input="speech",
-        action=f"{BASE_URL}/process",
-        method="POST",
-        timeout=5,
-        speech_timeout="auto",
-        language="en-US"
-    )
-    
-    # Get voice from business config
-    business = await get_active_business(organization_id)
-    voice = "Polly.Matthew-Neural"  # Default
-    if business:
-        voice = business.get("voice", "Polly.Matthew-Neural")
-    
-    gather.say(ai_response, voice=voice)
-    response.append(gather)
-    
-    # Fallback for no response
-    response.say("I didn't catch that. Could you please repeat?", voice=voice)
-    response.redirect(f"{BASE_URL}/process", method="POST")
+    return gather_twiml(ai_response, voice)
+
+
+async def _finalize_call(call_sid: str, caller_phone: str, session: dict, called_number: str):
+    """Final order extraction, save and summary email once a call ends.
+
+    Runs as a background task after the hangup response has been sent, and
+    deletes the call session.
+    """
+    # Pick up order_saved from a turn that finished since /hangup read it
+    session = await get_call_session(call_sid, create=False) or session
+    await delete_call_session(call_sid)
     
-    return Response(content=str(response), media_type="application/xml")
+    try:
+        order_info = await extract_order_info(session["conversation_history"], session.get("summary"))
+        logger.info(f"Final order extraction for call {call_sid}: {order_info}")
+        
+        # ALWAYS save order at end of call, even if incomplete
+        # This ensures we capture everything that was discussed
+        if not session.get("order_saved") and await claim_order_email(call_sid):
+            try:
+                # Get organization from session
+                org_id = session.get("organization_id")
+                if not org_id:
+                    org_id = await get_organization_by_phone(called_number)
+                # Save to database
+                order_id = await save_order(call_sid, caller_phone, order_info, org_id)
+                logger.info(f"Order saved to database with ID {order_id} for call {call_sid} (end of call)")
+            
+            except Exception as e:
+                logger.error(f"Error saving order at end of call: {e}", exc_info=True)
+            # Send email even if the database save failed
+            await queue_order_email(caller_phone, order_info)
+        else:
+            logger.info(f"Order already saved for call {call_sid}, skipping duplicate save")
+        
+        # Send summary email with full conversation
+        conversation_summary = "\n".join([
+            f"Caller: {turn.get('user', '')}\nAssistant: {turn.get('assistant', '')}"
+            for turn in session["conversation_history"]
+        ])
+        
+        # Always send email summary, even if order extraction wasn't perfect
+        await queue_order_email(caller_phone, order_info, conversation_summary)
+    except Exception as e:
+        logger.error(f"Error processing order at end of call: {e}", exc_info=True)
 
 
-@app.post("/hangup")
-async def hangup_call(request: Request):
+@app.post("/hangup", dependencies=[Depends(verify_twilio_signature)])
+async def hangup_call(request: Request, background: BackgroundTasks):
     """
     Called when call ends. Clean up and send final summary.
     """
@@ -327,72 +710,23 @@ async def hangup_call(request: Request):
     call_sid = form.get("CallSid")
     caller_phone = form.get("From", "Unknown")
     
+    session = await get_call_session(call_sid, create=False)
+    
     # Calculate call duration
     duration_seconds = None
-    if call_sid in call_sessions:
-        session = call_sessions[call_sid]
-        if "start_time" in session:
-            duration = datetime.now() - session["start_time"]
-            duration_seconds = int(duration.total_seconds())
+    if session and "start_ts" in session:
+        duration_seconds = int(time.time() - session["start_ts"])
     
     # Save call end to database
     await save_call_end(call_sid, duration_seconds)
     
-    if call_sid in call_sessions:
-        session = call_sessions[call_sid]
-        
-        # Extract final order info - ALWAYS save at end of call
+    if session:
+        # Extract final order info and email after responding
         if session["conversation_history"]:
-            try:
-                order_info = extract_order_info(session["conversation_history"])
-                logger.info(f"Final order extraction for call {call_sid}: {order_info}")
-                
-                # ALWAYS save order at end of call, even if incomplete
-                # This ensures we capture everything that was discussed
-                if not session.get("order_saved"):
-                    try:
-                        # Get organization from session
-                        org_id = session.get("organization_id")
-                        if not org_id:
-                            org_id = await get_organization_by_phone(form.get("Called", ""))
-                        # Save to database
-                        order_id = await save_order(call_sid, caller_phone, order_info, org_id)
-                        logger.info(f"Order saved to database with ID {order_id} for call {call_sid} (end of call)")
-                        
-                        # Also send email
-                        save_order_simple(order_info, caller_phone)
-                        session["order_saved"] = True
-                    except Exception as e:
-                        logger.error(f"Error saving order at end of call: {e}", exc_info=True)
-                        # Still try to send email
-                        try:
-                            save_order_simple(order_info, caller_phone)
-                        except Exception as email_error:
-                            logger.error(f"Error sending email: {email_error}", exc_info=True)
-                else:
-                    logger.info(f"Order already saved for call {call_sid}, skipping duplicate save")
-                
-                # Send summary email with full conversation
-                from utils import send_order_summary_email
-                conversation_summary = "\n".join([
-                    f"Caller: {turn.get('user', '')}\nAssistant: {turn.get('assistant', '')}"
-                    for turn in session["conversation_history"]
-                ])
-                
-                # Always send email summary, even if order extraction wasn't perfect
-                try:
-                    send_order_summary_email(
-                        caller_phone=caller_phone,
-                        order_info=order_info,
-                        conversation_summary=conversation_summary
-                    )
-                except Exception as e:
-                    logger.error(f"Error sending summary email: {e}", exc_info=True)
-            except Exception as e:
-                logger.error(f"Error processing order at end of call: {e}", exc_info=True)
-        
-        # Clean up session
-        del call_sessions[call_sid]
+            background.add_task(_finalize_call, call_sid, caller_phone, session, form.get("Called", ""))
+        else:
+            # Clean up session
+            await delete_call_session(call_sid)
     
     response = VoiceResponse()
     response.hangup()
@@ -406,17 +740,39 @@ async def health_check():
 
 
 # Dashboard API endpoints
+# Dashboards poll stats/charts on a timer; serve repeats from a short cache with an ETag
+DASHBOARD_CACHE_SECONDS = 15
+_dashboard_cache = TTLCache(maxsize=32, ttl=DASHBOARD_CACHE_SECONDS)
+
+
+async def _cached_json(request: Request, key: tuple, compute) -> Response:
+    """Return compute()'s result as JSON, cached briefly and answered with 304 when unchanged."""
+    entry = _dashboard_cache.get(key)
+    if entry is None:
+        body = orjson.dumps(jsonable_encoder(await compute()))
+        etag = f'"{hashlib.blake2b(body, digest_size=8).hexdigest()}"'
+        entry = _dashboard_cache[key] = (body, etag)
+    body, etag = entry
+    
+    headers = {"ETag": etag, "Cache-Control": f"max-age={DASHBOARD_CACHE_SECONDS}"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
 @app.get("/api/stats")
-async def get_stats():
+async def get_stats(request: Request):
     """Get dashboard statistics."""
-    stats = await get_statistics()
-    return stats
+    return await _cached_json(request, ("stats",), get_statistics)
 
 
 @app.get("/api/calls")
-async def get_calls(limit: int = 50):
+async def get_calls(limit: int = 50, search: Optional[str] = None):
     """Get recent calls."""
-    calls = await get_recent_calls(limit)
+    if search:
+        calls = await search_calls(search, limit)
+    else:
+        calls = await get_recent_calls(limit)
     return {"calls": calls}
 
 
@@ -439,21 +795,10 @@ async def get_appts(limit: int = 50, search: Optional[str] = None):
     return {"appointments": appointments}
 
 
-@app.get("/api/calls")
-async def get_calls(limit: int = 50, search: Optional[str] = None):
-    """Get recent calls."""
-    if search:
-        calls = await search_calls(search, limit)
-    else:
-        calls = await get_recent_calls(limit)
-    return {"calls": calls}
-
-
 @app.get("/api/charts")
-async def get_charts(days: int = 30):
+async def get_charts(request: Request, days: int = 30):
     """Get chart data."""
-    chart_data = await get_chart_data(days)
-    return chart_data
+    return await _cached_json(request, ("charts", days), lambda: get_chart_data(days))
 
 
 @app.put("/api/appointments/{appointment_id}/status")
@@ -463,23 +808,30 @@ async def update_appt_status(appointment_id: int, status: str = Query(...)):
     return {"success": True, "appointment_id": appointment_id, "status": status}
 
 
-@app.get("/api/export/calls")
-async def export_calls_csv():
-    """Export all calls to CSV."""
-    calls = await get_all_calls_for_export()
-    
+async def _stream_csv(header: list, rows, to_row):
+    """Yield CSV text one row at a time so exports use bounded memory."""
     output = io.StringIO()
     writer = csv.writer(output)
+    writer.writerow(header)
+    yield output.getvalue()
     
-    # Write header
-    writer.writerow([
+    async for item in rows:
+        output.seek(0)
+        output.truncate()
+        writer.writerow(to_row(item))
+        yield output.getvalue()
+
+
+@app.get("/api/export/calls")
+async def export_calls_csv():
+    """Export all calls to CSV."""
+    header = [
         "Call SID", "Caller Phone", "Start Time", "End Time", 
         "Duration (seconds)", "Emergency", "Status", "Conversation Turns"
-    ])
+    ]
     
-    # Write data
-    for call in calls:
-        writer.writerow([
+    def to_row(call):
+        return [
             call.get("call_sid", ""),
             call.get("caller_phone", ""),
             call.get("start_time", ""),
@@ -488,11 +840,10 @@ async def export_calls_csv():
             "Yes" if call.get("is_emergency") else "No",
             call.get("status", ""),
             call.get("conversation_turns", 0)
-        ])
+        ]
     
-    output.seek(0)
     return StreamingResponse(
-        iter([output.getvalue()]),
+        _stream_csv(header, iter_calls_for_export(), to_row),
         media_type="text/csv",
         headers={"Content-Disposition": "attachment; filename=calls_export.csv"}
     )
@@ -500,13 +851,31 @@ async def export_calls_csv():
 
 # Order API endpoints
 @app.get("/api/orders")
-async def get_orders_api(limit: int = 50, status: Optional[str] = None, order_type: Optional[str] = None, search: Optional[str] = None):
-    """Get orders with optional filtering."""
+async def get_orders_api(
+    limit: int = 50,
+    status: Optional[str] = None,
+    order_type: Optional[str] = None,
+    search: Optional[str] = None,
+    cursor: Optional[str] = None
+):
+    """Get orders with optional filtering.
+
+    Pass the returned next_cursor as cursor to fetch the next page.
+    """
+    try:
+        parse_order_cursor(cursor)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    
     if search:
-        orders = await search_orders(search, limit)
+        orders = await search_orders(search, limit, cursor=cursor)
     else:
-        orders = await get_orders(limit, status, order_type)
-    return {"orders": orders}
+        orders = await get_orders(limit, status, order_type, cursor=cursor)
+    
+    next_cursor = None
+    if orders and len(orders) == limit:
+        next_cursor = make_order_cursor(orders[-1])
+    return {"orders": orders, "next_cursor": next_cursor}
 
 
 @app.get("/api/orders/{order_id}")
@@ -531,6 +900,22 @@ async def update_order_status_api(order_id: int, status: str = Query(...)):
     return {"success": True, "order_id": order_id, "status": status}
 
 
+class OrderStatusUpdate(BaseModel):
+    order_id: int
+    status: str
+
+
+class BulkOrderStatusRequest(BaseModel):
+    updates: list[OrderStatusUpdate]
+
+
+@app.put("/api/orders/status")
+async def update_order_statuses_api(bulk: BulkOrderStatusRequest):
+    """Update the status of several orders at once."""
+    await update_order_statuses([(u.order_id, u.status) for u in bulk.updates])
+    return {"success": True, "updated": len(bulk.updates)}
+
+
 @app.get("/api/orders/stats")
 async def get_order_stats():
     """Get order statistics."""
@@ -541,22 +926,15 @@ async def get_order_stats():
 @app.get("/api/export/orders")
 async def export_orders_csv():
     """Export all orders to CSV."""
-    orders = await get_orders(limit=10000)  # Get all orders
-    
-    output = io.StringIO()
-    writer = csv.writer(output)
-    
-    # Write header
-    writer.writerow([
+    header = [
         "ID", "Call SID", "Caller Phone", "Customer Name", "Items", 
         "Order Type", "Delivery Address", "Pickup Name", "Phone Number",
         "Special Instructions", "Payment Method", "Total Estimate",
         "Order Status", "Created At"
-    ])
+    ]
     
-    # Write data
-    for order in orders:
-        writer.writerow([
+    def to_row(order):
+        return [
             order.get("id", ""),
             order.get("call_sid", ""),
             order.get("caller_phone", ""),
@@ -571,11 +949,10 @@ async def export_orders_csv():
             order.get("total_estimate", ""),
             order.get("order_status", ""),
             order.get("created_at", "")
-        ])
+        ]
     
-    output.seek(0)
     return StreamingResponse(
-        iter([output.getvalue()]),
+        _stream_csv(header, iter_orders_for_export(), to_row),
         media_type="text/csv",
         headers={"Content-Disposition": "attachment; filename=orders_export.csv"}
     )
@@ -584,21 +961,14 @@ async def export_orders_csv():
 @app.get("/api/export/appointments")
 async def export_appointments_csv():
     """Export all appointments to CSV."""
-    appointments = await get_all_appointments_for_export()
-    
-    output = io.StringIO()
-    writer = csv.writer(output)
-    
-    # Write header
-    writer.writerow([
+    header = [
         "ID", "Call SID", "Caller Phone", "Patient Status", "Reason", 
         "Insurance", "Preferred Time", "Caller Name", "Emergency", 
         "Booking Status", "Created At"
-    ])
+    ]
     
-    # Write data
-    for apt in appointments:
-        writer.writerow([
+    def to_row(apt):
+        return [
             apt.get("id", ""),
             apt.get("call_sid", ""),
             apt.get("caller_phone", ""),
@@ -610,61 +980,62 @@ async def export_appointments_csv():
             "Yes" if apt.get("is_emergency") else "No",
             apt.get("booking_status", ""),
             apt.get("created_at", "")
-        ])
+        ]
     
-    output.seek(0)
     return StreamingResponse(
-        iter([output.getvalue()]),
+        _stream_csv(header, iter_appointments_for_export(), to_row),
         media_type="text/csv",
         headers={"Content-Disposition": "attachment; filename=appointments_export.csv"}
     )
 
 
-@app.get("/health")
-async def health():
-    """Health check endpoint."""
-    return {"status": "ok", "service": "AI Phone Receptionist SaaS"}
+# HTML pages. On Vercel these are routed straight to /static by vercel.json;
+# these handlers are the fallback for local runs, serving bytes read once.
+_page_cache = {}
+
+
+def _static_page(filename: str) -> Response:
+    body = _page_cache.get(filename)
+    if body is None:
+        with open(os.path.join("static", filename), "rb") as f:
+            body = _page_cache[filename] = f.read()
+    return Response(content=body, media_type="text/html")
 
 
 @app.get("/")
 async def root():
     """Serve landing page."""
-    return FileResponse("static/landing.html")
+    return _static_page("landing.html")
 
 
 @app.get("/login")
 async def login_page():
     """Serve login page."""
-    return FileResponse("static/login.html")
+    return _static_page("login.html")
 
 
 @app.get("/signup")
 async def signup_page():
     """Serve signup page."""
-    return FileResponse("static/signup.html")
+    return _static_page("signup.html")
 
 
 @app.get("/dashboard")
 async def dashboard_page():
     """Serve customer dashboard."""
-    return FileResponse("static/customer_dashboard.html")
+    return _static_page("customer_dashboard.html")
 
 
 @app.get("/admin")
 async def admin_page():
     """Serve admin dashboard (legacy)."""
-    return FileResponse("static/admin.html")
-
+    return _static_page("admin.html")
 
-@app.get("/dashboard")
-async def dashboard():
-    """Serve business dashboard."""
-    return FileResponse("static/dashboard.html")
 
 @app.get("/old")
 async def old_dashboard():
     """Serve old dashboard."""
-    return FileResponse("static/index.html")
+    return _static_page("index.html")
 
 
 # Business Management API endpoints
@@ -691,10 +1062,10 @@ async def activate_business_api(business_id: int, org_id: int = Depends(get_curr
         raise HTTPException(status_code=404, detail="Business not found")
     
     await set_active_business(business_id, org_id)
-    # Reload active business in prompts cache
-    from prompts import load_active_business
-    await load_active_business()
-    return {"success": True, "business_id": business_id}
+    _invalidate_business_caches()
+    # Reload so new calls (and this response) reflect the change
+    cfg = await get_active_business_cfg(org_id)
+    return {"success": cfg.id == business_id, "business_id": business_id, "active_business_id": cfg.id}
 
 
 @app.get("/api/businesses/{business_id}")
@@ -714,13 +1085,18 @@ async def update_business_api(business_id: int, request: Request, org_id: int =
     business = await get_business(business_id)
     if not business or business.get("organization_id") != org_id:
         raise HTTPException(status_code=404, detail="Business not found")
+    # Older clients send config_json as JSON text; reject typos here instead of failing in the DB layer
+    config_json = data.get("config_json")
+    if isinstance(config_json, str) and config_json:
+        try:
+            json.loads(config_json)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="config_json must be valid JSON")
     
     await update_business(business_id, data)
-    # Reload if this is the active business
-    active = await get_active_business(org_id)
-    if active and active.get("id") == business_id:
-        from prompts import load_active_business
-        await load_active_business()
+    _invalidate_business_caches()
+    # Refresh this business's cached prompt (active or not)
+    cache_business_prompt(await get_business(business_id))
     return {"success": True, "business_id": business_id}
 
 
@@ -786,7 +1162,6 @@ async def signup(signup_data: SignupRequest):
         await ensure_db_initialized()
         
         # Check if user already exists
-        from auth import get_user_by_email
         existing_user = await get_user_by_email(signup_data.email)
         if existing_user:
             raise HTTPException(
@@ -807,7 +1182,6 @@ async def signup(signup_data: SignupRequest):
         )
         
         # Create default business for the organization
-        from database import init_default_businesses_for_org
         try:
             await init_default_businesses_for_org(org_id)
         except Exception as e:
@@ -841,6 +1215,13 @@ async def signup(signup_data: SignupRequest):
         )
 
 
+@app.post("/api/auth/logout")
+async def logout(credentials: HTTPAuthorizationCredentials = Depends(security)):
+    """Logout endpoint. Drops the server-side cache for this token."""
+    invalidate_token(credentials.credentials)
+    return {"success": True}
+
+
 @app.get("/api/auth/me")
 async def get_current_user_info(user: dict = Depends(get_current_user)):
     """Get current user information."""
@@ -866,6 +1247,7 @@ async def delete_business_api(business_id: int):
         return {"error": "Cannot delete active business. Please activate another business first."}, 400
     
     await delete_business(business_id)
+    _invalidate_business_caches()
     return {"success": True, "business_id": business_id}
 
 
@@ -878,10 +1260,24 @@ async def delete_businesses_by_assistant_api(assistant_name: str):
         return {"error": f"Cannot delete businesses with assistant '{assistant_name}' as one is currently active. Please activate another business first."}, 400
     
     deleted_count = await delete_businesses_by_assistant_name(assistant_name)
+    _invalidate_business_caches()
     return {"success": True, "deleted_count": deleted_count, "assistant_name": assistant_name}
 
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    # Multiple workers need the shared Redis session store; in-memory sessions
+    # would be split across processes
+    workers = int(os.getenv("WEB_CONCURRENCY", 2 if REDIS_URL else 1))
+    if workers > 1 and not REDIS_URL:
+        logger.warning("WEB_CONCURRENCY > 1 without REDIS_URL: call sessions won't be shared between workers")
+    uvicorn.run(
+        "main:app",
+        host="0.0.0.0",
+        port=8000,
+        workers=workers,
+        loop="uvloop",
+        http="httptools",
+        log_level="info"
+    )
 
@@ -1,10 +1,26 @@
 """
 Organization management for multi-tenant SaaS.
 """
+import asyncio
+import time
 from typing import Dict, List, Optional
-from database import get_pool
+from cachetools import TTLCache
+from database import get_pool, get_read_pool
 from auth import get_password_hash
 
+# Read-heavy lookups hit on every call/request; writes clear them
+_org_cache = TTLCache(maxsize=1024, ttl=60)
+# Called number -> organization; the mapping rarely changes
+_org_by_phone_cache = TTLCache(maxsize=1024, ttl=300)
+# Users per organization for the dashboard; cleared when users are added
+_users_cache = TTLCache(maxsize=1024, ttl=30)
+
+
+def invalidate_organization_caches():
+    """Drop cached organization lookups (after organization or business changes)."""
+    _org_cache.clear()
+    _org_by_phone_cache.clear()
+
 
 async def create_organization(name: str, subdomain: str = None) -> int:
     """Create a new organization."""
@@ -33,7 +49,6 @@ async def create_organization(name: str, subdomain: str = None) -> int:
             # Safety check to prevent infinite loop
             if counter > 1000:
                 # Use timestamp as fallback
-                import time
                 subdomain = f"{original_subdomain}-{int(time.time())}"
                 break
         
@@ -41,6 +56,7 @@ async def create_organization(name: str, subdomain: str = None) -> int:
             "INSERT INTO organizations (name, subdomain) VALUES ($1, $2) RETURNING id",
             name, subdomain
         )
+        invalidate_organization_caches()
         return org_id
 
 
@@ -51,51 +67,98 @@ async def create_user(
     full_name: str = None,
     role: str = "admin"
 ) -> int:
-    """Create a new user."""
+    """Create a new user. Raises ValueError if the organization doesn't exist."""
     password_hash = get_password_hash(password)
     pool = await get_pool()
-    async with pool.acquire() as conn:
-        user_id = await conn.fetchval(
-            """INSERT INTO users (email, password_hash, organization_id, full_name, role)
-               VALUES ($1, $2, $3, $4, $5) RETURNING id""",
-            email, password_hash, organization_id, full_name or email.split("@")[0], role
-        )
-        return user_id
+    # Organization check and insert in one round-trip
+    user_id = await pool.fetchval(
+        """INSERT INTO users (email, password_hash, organization_id, full_name, role)
+           SELECT $1, $2, $3, $4, $5
+           WHERE EXISTS (SELECT 1 FROM organizations WHERE id = $3)
+           RETURNING id""",
+        email, password_hash, organization_id, full_name or email.split("@")[0], role
+    )
+    if user_id is None:
+        raise ValueError(f"Organization {organization_id} not found")
+    _users_cache.pop(organization_id, None)
+    return user_id
+
+
+async def create_users_bulk(users: List[Dict]) -> List[int]:
+    """Create many users in one round-trip.
+
+    Each dict takes the create_user arguments (email, password,
+    organization_id, optional full_name and role). Returns the new user IDs
+    in input order.
+    """
+    if not users:
+        return []
+    # bcrypt is CPU-bound and releases the GIL, so hash in parallel threads
+    password_hashes = await asyncio.gather(*(
+        asyncio.to_thread(get_password_hash, user["password"]) for user in users
+    ))
+    emails = [user["email"] for user in users]
+    pool = await get_pool()
+    rows = await pool.fetch(
+        """INSERT INTO users (email, password_hash, organization_id, full_name, role)
+           SELECT * FROM unnest($1::varchar[], $2::varchar[], $3::int[], $4::varchar[], $5::varchar[])
+           RETURNING id, email""",
+        emails,
+        list(password_hashes),
+        [user["organization_id"] for user in users],
+        [user.get("full_name") or user["email"].split("@")[0] for user in users],
+        [user.get("role", "admin") for user in users]
+    )
+    for user in users:
+        _users_cache.pop(user["organization_id"], None)
+    ids = {row["email"]: row["id"] for row in rows}
+    return [ids[email] for email in emails]
 
 
 async def get_organization(organization_id: int) -> Optional[Dict]:
     """Get organization by ID."""
-    pool = await get_pool()
-    async with pool.acquire() as conn:
-        row = await conn.fetchrow("SELECT * FROM organizations WHERE id = $1", organization_id)
-        return dict(row) if row else None
+    # Callers get their own copy, so changing one can't alter the cached entry
+    org = _org_cache.get(organization_id)
+    if org is not None:
+        return dict(org)
+    pool = await get_read_pool()
+    row = await pool.fetchrow("SELECT * FROM organizations WHERE id = $1", organization_id)
+    if row is None:
+        return None
+    org = _org_cache[organization_id] = dict(row)
+    return dict(org)
 
 
 async def get_organization_users(organization_id: int) -> List[Dict]:
     """Get all users in an organization."""
-    pool = await get_pool()
-    async with pool.acquire() as conn:
-        rows = await conn.fetch(
+    # Callers get their own copies, so changing one can't alter the cached entry
+    users = _users_cache.get(organization_id)
+    if users is None:
+        pool = await get_read_pool()
+        rows = await pool.fetch(
             "SELECT id, email, full_name, role, is_active, created_at FROM users WHERE organization_id = $1",
             organization_id
         )
-        return [dict(row) for row in rows]
+        users = _users_cache[organization_id] = [dict(row) for row in rows]
+    return [dict(user) for user in users]
 
 
 async def get_organization_by_phone(phone_number: str) -> Optional[int]:
     """Get organization ID by phone number (from businesses table)."""
-    pool = await get_pool()
-    async with pool.acquire() as conn:
-        org_id = await conn.fetchval(
-            """SELECT organization_id FROM businesses 
-               WHERE phone_number = $1 AND is_active = true 
-               LIMIT 1""",
-            phone_number
-        )
-        
-        if org_id:
-            return org_id
-        
-        # Fallback: get first organization (for development)
-        org_id = await conn.fetchval("SELECT id FROM organizations LIMIT 1")
+    org_id = _org_by_phone_cache.get(phone_number)
+    if org_id is not None:
         return org_id
+    pool = await get_pool()
+    # Falls back to the first organization (for development) in the same query
+    org_id = await pool.fetchval(
+        """SELECT COALESCE(
+               (SELECT organization_id FROM businesses
+                WHERE phone_number = $1 AND is_active = true
+                LIMIT 1),
+               (SELECT id FROM organizations LIMIT 1)
+           )""",
+        phone_number
+    )
+    if org_id is not None:
+        _org_by_phone_cache[phone_number] = org_id
+    return org_id
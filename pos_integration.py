@@ -6,9 +6,10 @@ Supports: Square, Toast, Clover, and generic REST API.
 """
 
 import os
-import json
+import asyncio
 import logging
 import httpx
+import orjson
 from typing import Dict, Optional
 from dotenv import load_dotenv
 
@@ -21,6 +22,34 @@ POS_API_KEY = os.getenv("POS_API_KEY", "")
 POS_LOCATION_ID = os.getenv("POS_LOCATION_ID", "")
 POS_API_URL = os.getenv("POS_API_URL", "")
 
+# Shared client so repeat orders reuse keep-alive (HTTP/2) connections
+_client = None
+
+
+def get_pos_client() -> httpx.AsyncClient:
+    """Get or create the shared POS HTTP client."""
+    global _client
+    if _client is None:
+        _client = httpx.AsyncClient(
+            http2=True,
+            timeout=10.0,
+            limits=httpx.Limits(max_keepalive_connections=32, max_connections=64)
+        )
+    return _client
+
+
+async def close_pos_client():
+    """Close the shared POS HTTP client."""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+# Orders currently being submitted, so identical concurrent submissions
+# (webhook retries, overlapping saves) share one outbound request
+_inflight = {}
+
 
 async def create_pos_order(order_info: Dict, caller_phone: str) -> Dict:
     """
@@ -37,6 +66,32 @@ async def create_pos_order(order_info: Dict, caller_phone: str) -> Dict:
         logger.warning("POS integration not configured")
         return {"success": False, "error": "POS not configured"}
     
+    # Key on the whole order so submissions differing only in address/name
+    # (different POS payloads) are never merged
+    key = (POS_SYSTEM, caller_phone, orjson.dumps(order_info, option=orjson.OPT_SORT_KEYS, default=str))
+    pending = _inflight.get(key)
+    if pending is not None:
+        # wait() doesn't propagate our cancellation to the shared future; if
+        # the submitting request was cancelled instead, submit this one ourselves
+        await asyncio.wait((pending,))
+        if not pending.cancelled():
+            return pending.result()
+        return await _submit_pos_order(order_info, caller_phone)
+    
+    future = asyncio.get_running_loop().create_future()
+    _inflight[key] = future
+    try:
+        result = await _submit_pos_order(order_info, caller_phone)
+        future.set_result(result)
+        return result
+    finally:
+        del _inflight[key]
+        if not future.done():
+            future.cancel()
+
+
+async def _submit_pos_order(order_info: Dict, caller_phone: str) -> Dict:
+    """Send the order to the configured POS provider."""
     try:
         if POS_SYSTEM == "square":
             return await create_square_order(order_info, caller_phone)
@@ -54,6 +109,36 @@ async def create_pos_order(order_info: Dict, caller_phone: str) -> Dict:
         return {"success": False, "error": str(e)}
 
 
+def _build_pickup(order_info: Dict, caller_phone: str) -> Dict:
+    """Square fulfillment for a pickup order."""
+    return {
+        "type": "PICKUP",
+        "pickup_details": {
+            "recipient": {
+                "display_name": order_info.get("pickup_name") or order_info.get("customer_name", ""),
+                "phone_number": caller_phone,
+            },
+            "expected_duration": "PT30M"
+        }
+    }
+
+
+def _build_shipment(order_info: Dict, caller_phone: str) -> Dict:
+    """Square fulfillment for a delivery order."""
+    return {
+        "type": "SHIPMENT",
+        "shipment_details": {
+            "recipient": {
+                "display_name": order_info.get("customer_name", ""),
+                "address": {
+                    "address_line_1": order_info.get("delivery_address", "")
+                },
+                "phone_number": caller_phone,
+            }
+        }
+    }
+
+
 async def create_square_order(order_info: Dict, caller_phone: str) -> Dict:
     """
     Create order in Square POS.
@@ -76,30 +161,18 @@ async def create_square_order(order_info: Dict, caller_phone: str) -> Dict:
                 "variation_name": item.get("size", ""),
             })
         
+        if order_info.get("order_type") == "pickup":
+            fulfillment = _build_pickup(order_info, caller_phone)
+        else:
+            fulfillment = _build_shipment(order_info, caller_phone)
+        
         # Build Square order payload
         order_data = {
             "idempotency_key": f"order_{caller_phone}_{order_info.get('order_type', 'pickup')}",
             "order": {
                 "location_id": POS_LOCATION_ID,
                 "line_items": line_items,
-                "fulfillments": [{
-                    "type": "PICKUP" if order_info.get("order_type") == "pickup" else "SHIPMENT",
-                    "pickup_details" if order_info.get("order_type") == "pickup" else "shipment_details": {
-                        "recipient": {
-                            "display_name": order_info.get("pickup_name") or order_info.get("customer_name", ""),
-                            "phone_number": caller_phone,
-                        },
-                        "expected_duration": "PT30M"
-                    } if order_info.get("order_type") == "pickup" else {
-                        "recipient": {
-                            "display_name": order_info.get("customer_name", ""),
-                            "address": {
-                                "address_line_1": order_info.get("delivery_address", "")
-                            },
-                            "phone_number": caller_phone,
-                        }
-                    }
-                }],
+                "fulfillments": [fulfillment],
                 "note": order_info.get("special_instructions", "")
             }
         }
@@ -111,22 +184,22 @@ async def create_square_order(order_info: Dict, caller_phone: str) -> Dict:
             "Square-Version": "2023-10-18"
         }
         
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                f"{POS_API_URL}/orders",
-                json=order_data,
-                headers=headers,
-                timeout=10.0
-            )
-            response.raise_for_status()
-            result = response.json()
-            
-            return {
-                "success": True,
-                "pos_order_id": result.get("order", {}).get("id"),
-                "pos_system": "square"
-            }
-            
+        client = get_pos_client()
+        response = await client.post(
+            f"{POS_API_URL}/orders",
+            content=orjson.dumps(order_data),
+            headers=headers,
+            timeout=10.0
+        )
+        response.raise_for_status()
+        result = orjson.loads(response.content)
+        
+        return {
+            "success": True,
+            "pos_order_id": result.get("order", {}).get("id"),
+            "pos_system": "square"
+        }
+        
     except httpx.HTTPStatusError as e:
         logger.error(f"Square API error: {e.response.text}")
         return {"success": False, "error": f"Square API error: {e.response.status_code}"}
@@ -171,22 +244,22 @@ async def create_toast_order(order_info: Dict, caller_phone: str) -> Dict:
             "Content-Type": "application/json"
         }
         
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                f"{POS_API_URL}/online-ordering/v2/orders",
-                json=order_data,
-                headers=headers,
-                timeout=10.0
-            )
-            response.raise_for_status()
-            result = response.json()
-            
-            return {
-                "success": True,
-                "pos_order_id": result.get("guid"),
-                "pos_system": "toast"
-            }
-            
+        client = get_pos_client()
+        response = await client.post(
+            f"{POS_API_URL}/online-ordering/v2/orders",
+            content=orjson.dumps(order_data),
+            headers=headers,
+            timeout=10.0
+        )
+        response.raise_for_status()
+        result = orjson.loads(response.content)
+        
+        return {
+            "success": True,
+            "pos_order_id": result.get("guid"),
+            "pos_system": "toast"
+        }
+        
     except Exception as e:
         logger.error(f"Error creating Toast order: {e}", exc_info=True)
         return {"success": False, "error": str(e)}
@@ -225,22 +298,22 @@ async def create_clover_order(order_info: Dict, caller_phone: str) -> Dict:
             "Content-Type": "application/json"
         }
         
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                f"{POS_API_URL}/v3/merchants/{POS_LOCATION_ID}/orders",
-                json=order_data,
-                headers=headers,
-                timeout=10.0
-            )
-            response.raise_for_status()
-            result = response.json()
-            
-            return {
-                "success": True,
-                "pos_order_id": result.get("id"),
-                "pos_system": "clover"
-            }
-            
+        client = get_pos_client()
+        response = await client.post(
+            f"{POS_API_URL}/v3/merchants/{POS_LOCATION_ID}/orders",
+            content=orjson.dumps(order_data),
+            headers=headers,
+            timeout=10.0
+        )
+        response.raise_for_status()
+        result = orjson.loads(response.content)
+        
+        return {
+            "success": True,
+            "pos_order_id": result.get("id"),
+            "pos_system": "clover"
+        }
+        
     except Exception as e:
         logger.error(f"Error creating Clover order: {e}", exc_info=True)
         return {"success": False, "error": str(e)}
@@ -270,21 +343,21 @@ async def create_generic_order(order_info: Dict, caller_phone: str) -> Dict:
             "Content-Type": "application/json"
         }
         
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                POS_API_URL,
-                json=order_data,
-                headers=headers,
-                timeout=10.0
-            )
-            response.raise_for_status()
-            
-            return {
-                "success": True,
-                "pos_order_id": response.json().get("order_id"),
-                "pos_system": "generic"
-            }
-            
+        client = get_pos_client()
+        response = await client.post(
+            POS_API_URL,
+            content=orjson.dumps(order_data),
+            headers=headers,
+            timeout=10.0
+        )
+        response.raise_for_status()
+        
+        return {
+            "success": True,
+            "pos_order_id": orjson.loads(response.content).get("order_id"),
+            "pos_system": "generic"
+        }
+        
     except Exception as e:
         logger.error(f"Error creating generic order: {e}", exc_info=True)
         return {"success": False, "error": str(e)}
@@ -300,23 +373,23 @@ def parse_order_items(items_str: str) -> list:
     Returns:
         List of item dictionaries
     """
-    items = []
+    if isinstance(items_str, list):
+        return items_str
+    if not isinstance(items_str, (str, bytes)):
+        return []
     
     try:
         # Try parsing as JSON first
-        if isinstance(items_str, str):
-            parsed = json.loads(items_str)
-            if isinstance(parsed, list):
-                items = parsed
-            elif isinstance(parsed, dict) and "items" in parsed:
-                items = parsed["items"]
-        elif isinstance(items_str, list):
-            items = items_str
-    except (json.JSONDecodeError, TypeError):
+        parsed = orjson.loads(items_str)
+    except orjson.JSONDecodeError:
         # If not JSON, create simple item from string
-        items = [{"name": items_str, "quantity": 1, "size": ""}]
+        return [{"name": items_str, "quantity": 1, "size": ""}]
     
-    return items
+    if isinstance(parsed, list):
+        return parsed
+    if isinstance(parsed, dict) and "items" in parsed:
+        return parsed["items"]
+    return []
 
 
 # Note: For production use, you'll need to:
@@ -4,8 +4,15 @@ Supports multiple business types loaded from database.
 """
 
 import asyncio
+import logging
+import re
+import sys
+from contextvars import ContextVar
+from typing import Optional
 from database import get_active_business
 
+logger = logging.getLogger(__name__)
+
 # Load menu reference (for pizza)
 MENU_REFERENCE = ""
 try:
@@ -14,10 +21,32 @@ try:
 except:
     MENU_REFERENCE = "Menu information not available. Ask customer what they'd like to order."
 
-# Cache for active business
-_active_business_cache = None
+# Active business for the current call/request. A ContextVar, so concurrent
+# calls for different organizations never see each other's business.
+_active_business: ContextVar[Optional[dict]] = ContextVar("_active_business", default=None)
+# Custom system prompts by business ID, filled as businesses are loaded
+_prompt_by_business_id = {}
+
+
+def cache_business_prompt(business: Optional[dict]) -> None:
+    """Record a business's custom system prompt in the process-wide cache."""
+    if business and business.get("id") is not None:
+        if business.get("system_prompt"):
+            _prompt_by_business_id[business["id"]] = sys.intern(business["system_prompt"])
+        else:
+            _prompt_by_business_id.pop(business["id"], None)
+
+
+def set_active_business_cache(business: Optional[dict]) -> None:
+    """Set the active business snapshot for the current call/request.
 
-SYSTEM_PROMPT = f"""You are John, a friendly pizza order taker for Nunzio's Pizza.
+    Only visible to the current request's context; use cache_business_prompt
+    for state that outlives the request.
+    """
+    _active_business.set(business)
+    cache_business_prompt(business)
+
+SYSTEM_PROMPT = sys.intern(f"""You are John, a friendly pizza order taker for Nunzio's Pizza.
 
 === MENU (REFERENCE THIS FOR ALL ITEMS) ===
 {MENU_REFERENCE}
@@ -99,7 +128,7 @@ HELPFUL TIPS:
 - Be enthusiastic about the pizza!
 - Keep track of what they've ordered and what information you still need
 - Always ask questions until you have a complete order
-- ALWAYS confirm the full order at the end before saying goodbye"""
+- ALWAYS confirm the full order at the end before saying goodbye""")
 
 # Order questions (not in strict order, but these are things to ask about)
 ORDER_QUESTIONS = [
@@ -112,44 +141,49 @@ ORDER_QUESTIONS = [
     "Is that everything?"
 ]
 
-def get_business_prompt() -> str:
-    """Get the system prompt for the active business."""
-    global _active_business_cache
-    
-    # Try to get from cache first (for sync calls)
-    if _active_business_cache and _active_business_cache.get("system_prompt"):
-        return _active_business_cache["system_prompt"]
+def get_business_prompt(business_id: int = None) -> str:
+    """Get the system prompt for a business (the active one by default)."""
+    if business_id is None:
+        business = _active_business.get()
+        business_id = business.get("id") if business else None
     
     # Fallback to default pizza prompt
-    return SYSTEM_PROMPT
+    return _prompt_by_business_id.get(business_id, SYSTEM_PROMPT)
 
 
-async def load_active_business():
-    """Load active business configuration from database."""
-    global _active_business_cache
+async def load_active_business(organization_id: int = None):
+    """Load the active business from the database and cache its prompt."""
     try:
-        business = await get_active_business()
+        business = await get_active_business(organization_id)
         if business:
-            _active_business_cache = dict(business)
+            cache_business_prompt(business)
             return business
-    except Exception as e:
-        print(f"Error loading active business: {e}")
+    except Exception:
+        logger.exception("Error loading active business")
     return None
 
 
 def get_active_business_sync():
     """Get active business synchronously (uses cache)."""
-    global _active_business_cache
-    return _active_business_cache if _active_business_cache else None
+    return _active_business.get() or None
+
+
+EMERGENCY_BUSINESS_TYPES = frozenset(["doctor", "dentist"])
+EMERGENCY_KEYWORDS = ["severe pain", "bleeding", "swelling", "infection",
+                      "can't eat", "can't sleep", "urgent", "emergency"]
+# One pass over the utterance instead of a substring scan per keyword
+_EMERGENCY_RE = re.compile("|".join(map(re.escape, EMERGENCY_KEYWORDS)))
+
 
+def check_for_emergency(user_input: str, user_input_lower: str = None) -> bool:
+    """Check for emergency keywords based on business type.
 
-def check_for_emergency(user_input: str) -> bool:
-    """Check for emergency keywords based on business type."""
+    Pass user_input_lower when the caller has already lowercased the input.
+    """
     business = get_active_business_sync()
-    if business and business.get("type") in ["doctor", "dentist"]:
-        emergency_keywords = ["severe pain", "bleeding", "swelling", "infection", 
-                            "can't eat", "can't sleep", "urgent", "emergency"]
-        user_lower = user_input.lower()
-        return any(keyword in user_lower for keyword in emergency_keywords)
+    if business and business.get("type") in EMERGENCY_BUSINESS_TYPES:
+        if user_input_lower is None:
+            user_input_lower = user_input.lower()
+        return _EMERGENCY_RE.search(user_input_lower) is not None
     return False
 
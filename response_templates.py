@@ -3,6 +3,8 @@ Response templates for common phrases to speed up responses.
 These are used as fallbacks or quick responses for common scenarios.
 """
 
+import random
+
 RESPONSE_TEMPLATES = {
     "greeting_acknowledgment": [
         "Got it!",
@@ -60,12 +62,41 @@ RESPONSE_TEMPLATES = {
     ]
 }
 
+# Frozen copies for lookups, and a module RNG rather than the shared global one
+_TEMPLATES = {key: tuple(templates) for key, templates in RESPONSE_TEMPLATES.items()}
+_RNG = random.Random()
+# For power-of-two sized lists a random index is just that many random bits
+_INDEX_BITS = {
+    key: len(templates).bit_length() - 1
+    for key, templates in _TEMPLATES.items()
+    if templates and len(templates) & (len(templates) - 1) == 0
+}
+
+# UTF-8 copies of the templates without placeholders, for byte-oriented sinks
+_TEMPLATES_BYTES = {
+    key: tuple(template.encode("utf-8") for template in templates)
+    for key, templates in _TEMPLATES.items()
+    if not any("{" in template for template in templates)
+}
+
+
 def get_template_response(template_key: str, **kwargs) -> str:
     """Get a random template response."""
-    import random
-    templates = RESPONSE_TEMPLATES.get(template_key, [])
-    if templates:
-        response = random.choice(templates)
-        return response.format(**kwargs) if kwargs else response
-    return ""
+    templates = _TEMPLATES.get(template_key)
+    if not templates:
+        return ""
+    bits = _INDEX_BITS.get(template_key)
+    response = templates[_RNG.getrandbits(bits)] if bits is not None else _RNG.choice(templates)
+    return response.format_map(kwargs) if kwargs else response
+
+
+def get_template_bytes(template_key: str) -> bytes:
+    """Get a random template response as pre-encoded UTF-8.
 
+    Only templates without placeholders are available; returns b"" otherwise.
+    """
+    templates = _TEMPLATES_BYTES.get(template_key)
+    if not templates:
+        return b""
+    bits = _INDEX_BITS.get(template_key)
+    return templates[_RNG.getrandbits(bits)] if bits is not None else _RNG.choice(templates)
@@ -3,15 +3,25 @@ Utility functions for LLM interaction, appointment booking, and email.
 """
 
 import os
-import json
+import re
+import orjson
+import asyncio
+import hashlib
+import random
 import logging
-from typing import Dict, Optional
-from openai import OpenAI
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
+from typing import AsyncIterator, Dict, Optional
+import httpx
+from openai import AsyncOpenAI, APIConnectionError, InternalServerError, RateLimitError
+from email.message import EmailMessage
 import smtplib
+import time
+import atexit
+import threading
+from dataclasses import dataclass
 from datetime import datetime
 from dotenv import load_dotenv
+from prompts import SYSTEM_PROMPT, MENU_REFERENCE
+from llm_cache import get_llm_cache
 
 # Load environment variables
 load_dotenv()
@@ -20,6 +30,19 @@ logger = logging.getLogger(__name__)
 
 # Initialize OpenAI client lazily
 _client = None
+# Shared HTTP client so every turn reuses pooled keep-alive (HTTP/2) connections
+_http_client = None
+
+def get_http_client() -> httpx.AsyncClient:
+    """Get or create the shared HTTP client used for OpenAI calls."""
+    global _http_client
+    if _http_client is None:
+        _http_client = httpx.AsyncClient(
+            http2=True,
+            timeout=8.0,
+            limits=httpx.Limits(max_keepalive_connections=50, max_connections=100)
+        )
+    return _http_client
 
 def get_openai_client():
     """Get or create OpenAI client."""
@@ -28,20 +51,294 @@ def get_openai_client():
         api_key = os.getenv("OPENAI_API_KEY")
         if not api_key:
             raise ValueError("OPENAI_API_KEY environment variable not set")
-        _client = OpenAI(api_key=api_key)
+        # Retries are done in _chat_completion, outside the concurrency cap
+        _client = AsyncOpenAI(api_key=api_key, http_client=get_http_client(), max_retries=0)
     return _client
 
-# Office configuration
-OFFICE_NAME = os.getenv("OFFICE_NAME", "Bright Smile Dental")
-OFFICE_EMAIL = os.getenv("OFFICE_EMAIL")
-OFFICE_PHONE = os.getenv("OFFICE_PHONE_NUMBER")
+# Cap concurrent OpenAI requests from this process to stay under rate limits
+OPENAI_MAX_CONCURRENCY = int(os.getenv("OPENAI_MAX_CONCURRENCY", "50"))
+_openai_semaphore = asyncio.Semaphore(OPENAI_MAX_CONCURRENCY)
+
+# Retry rate limits and transient errors with exponential backoff + jitter,
+# honoring Retry-After when OpenAI sends it
+OPENAI_MAX_ATTEMPTS = 3
+OPENAI_BACKOFF_MAX = 30.0  # seconds
+_RETRYABLE_ERRORS = (RateLimitError, APIConnectionError, InternalServerError)
+
+
+def _retry_delay(error: Exception, attempt: int) -> float:
+    """Seconds to wait before retrying after error on the given attempt (0-based)."""
+    response = getattr(error, "response", None)
+    if response is not None:
+        headers = response.headers
+        try:
+            if "retry-after-ms" in headers:
+                return min(float(headers["retry-after-ms"]) / 1000, OPENAI_BACKOFF_MAX)
+            if "retry-after" in headers:
+                return min(float(headers["retry-after"]), OPENAI_BACKOFF_MAX)
+        except ValueError:
+            pass  # HTTP-date form; fall back to exponential backoff
+    return min(2 ** attempt + random.uniform(0, 1), OPENAI_BACKOFF_MAX)
+
+# Only near-deterministic requests are worth serving from the exact-match cache
+LLM_CACHE_MAX_TEMPERATURE = 0.3
+
+async def _create_completion(**kwargs):
+    """Create a chat completion, retrying rate limits and transient errors.
+
+    Only the create call holds a concurrency slot, so a streamed response
+    releases it once the stream is open.
+    """
+    client = get_openai_client()
+    for attempt in range(OPENAI_MAX_ATTEMPTS):
+        try:
+            async with _openai_semaphore:
+                return await client.chat.completions.create(**kwargs)
+        except _RETRYABLE_ERRORS as e:
+            if attempt == OPENAI_MAX_ATTEMPTS - 1:
+                raise
+            delay = _retry_delay(e, attempt)
+            logger.warning("OpenAI request failed (%s), retrying in %.1fs", type(e).__name__, delay)
+            # Sleep outside the semaphore so waiting retries don't hold slots
+            await asyncio.sleep(delay)
+
+async def _chat_completion(**kwargs) -> str:
+    """Create a chat completion and return its text.
+
+    Bounded by the concurrency cap; low-temperature requests go through the
+    exact-match LLM cache.
+    """
+    async def compute() -> str:
+        response = await _create_completion(**kwargs)
+        return response.choices[0].message.content.strip()
+    
+    if kwargs.get("temperature", 1.0) <= LLM_CACHE_MAX_TEMPERATURE:
+        return await get_llm_cache().get_or_compute(kwargs, compute)
+    return await compute()
+
+async def close_openai_client():
+    """Close the shared HTTP client."""
+    global _client, _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+    _client = None
+    _http_client = None
+
+@dataclass(slots=True, frozen=True)
+class _Cfg:
+    """Office and email settings, read from the environment once at import."""
+    office_name: str
+    office_email: Optional[str]
+    office_phone: Optional[str]
+    gmail_user: Optional[str]
+    gmail_app_password: Optional[str]
+
+    @property
+    def email_configured(self) -> bool:
+        return bool(self.office_email and self.gmail_user and self.gmail_app_password)
+
+
+CFG = _Cfg(
+    office_name=os.getenv("OFFICE_NAME", "Bright Smile Dental"),
+    office_email=os.getenv("OFFICE_EMAIL"),
+    office_phone=os.getenv("OFFICE_PHONE_NUMBER"),
+    gmail_user=os.getenv("GMAIL_USER"),
+    gmail_app_password=os.getenv("GMAIL_APP_PASSWORD"),
+)
 
 # Email configuration
-GMAIL_USER = os.getenv("GMAIL_USER")
-GMAIL_APP_PASSWORD = os.getenv("GMAIL_APP_PASSWORD")
+SMTP_HOST = "smtp.gmail.com"
+SMTP_PORT = 587
+# Reconnect after this many messages so one connection doesn't live forever
+SMTP_MAX_MESSAGES_PER_CONNECTION = 100
+
+# One logged-in SMTP connection reused across emails (connect + STARTTLS +
+# login costs far more than sending); senders run in threads, hence the lock
+_smtp = None
+_smtp_sent = 0
+_smtp_lock = threading.Lock()
+
+
+def _close_smtp():
+    """Close the shared SMTP connection (caller holds _smtp_lock)."""
+    global _smtp
+    if _smtp is not None:
+        _discard_smtp(_smtp)
+        _smtp = None
+
+
+def _discard_smtp(smtp: smtplib.SMTP):
+    """Quit an SMTP connection, dropping the socket even if QUIT fails."""
+    try:
+        smtp.quit()
+    except (smtplib.SMTPException, OSError):
+        smtp.close()
+
 
+def _connect_smtp():
+    """Open and log in a new shared SMTP connection (caller holds _smtp_lock).
 
-def generate_response(user_input: str, conversation_history: list = None, system_prompt: str = None) -> str:
+    The connection is only shared once login succeeds, so a failed login
+    never leaves an unauthenticated connection behind.
+    """
+    global _smtp, _smtp_sent
+    _close_smtp()
+    smtp = smtplib.SMTP(SMTP_HOST, SMTP_PORT, timeout=10)
+    try:
+        smtp.starttls()
+        smtp.login(CFG.gmail_user, CFG.gmail_app_password)
+    except BaseException:
+        _discard_smtp(smtp)
+        raise
+    _smtp = smtp
+    _smtp_sent = 0
+
+
+def _send_smtp(msg):
+    """Send a message over the shared connection, reconnecting when needed."""
+    global _smtp_sent
+    with _smtp_lock:
+        if _smtp is None or _smtp_sent >= SMTP_MAX_MESSAGES_PER_CONNECTION:
+            _connect_smtp()
+        try:
+            _smtp.send_message(msg)
+        except (smtplib.SMTPException, OSError):
+            # Dropped idle connection or a connection left in a bad state;
+            # retry once on a fresh one
+            _connect_smtp()
+            try:
+                _smtp.send_message(msg)
+            except (smtplib.SMTPException, OSError):
+                _close_smtp()
+                raise
+        _smtp_sent += 1
+
+
+def _close_smtp_at_exit():
+    with _smtp_lock:
+        _close_smtp()
+
+
+atexit.register(_close_smtp_at_exit)
+
+# Attempts per order email before giving up
+EMAIL_MAX_ATTEMPTS = 3
+
+# Semantic cache for opening-turn replies: callers often open with the same
+# question in different words. Opt-in (needs numpy): SEMANTIC_CACHE=1
+SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE", "").lower() in ("1", "true", "yes")
+SEMANTIC_CACHE_THRESHOLD = 0.93
+SEMANTIC_CACHE_MAX_ENTRIES = 1024
+EMBEDDING_MODEL = "text-embedding-3-small"
+# Never cache replies to input that may carry personal details (numbers, emails, addresses)
+_PII_RE = re.compile(r"\d|@|\b(street|st|avenue|ave|road|rd|drive|dr|lane|ln|apt|apartment|suite)\b", re.IGNORECASE)
+# System prompt hash -> (normalized embedding matrix, replies)
+_semantic_cache = {}
+
+
+async def _embed(text: str):
+    """Unit-length embedding for text."""
+    import numpy as np
+    client = get_openai_client()
+    async with _openai_semaphore:
+        response = await client.embeddings.create(model=EMBEDDING_MODEL, input=text)
+    vector = np.asarray(response.data[0].embedding, dtype=np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+def _semantic_lookup(prompt_key: bytes, query) -> Optional[str]:
+    """Cached reply whose input is close enough to the query, if any."""
+    entry = _semantic_cache.get(prompt_key)
+    if entry is None:
+        return None
+    vectors, replies = entry
+    similarities = vectors @ query
+    best = int(similarities.argmax())
+    return replies[best] if similarities[best] >= SEMANTIC_CACHE_THRESHOLD else None
+
+
+def _semantic_store(prompt_key: bytes, query, reply: str):
+    """Add a reply to the cache, dropping the oldest entries past the limit."""
+    import numpy as np
+    entry = _semantic_cache.get(prompt_key)
+    if entry is None:
+        _semantic_cache[prompt_key] = (query[None, :], [reply])
+        return
+    vectors, replies = entry
+    keep = SEMANTIC_CACHE_MAX_ENTRIES - 1
+    _semantic_cache[prompt_key] = (np.vstack((vectors[-keep:], query)), replies[-keep:] + [reply])
+
+# Static extraction instructions and menu, identical on every call so OpenAI
+# prompt caching can reuse them; only the conversation goes in the user message
+EXTRACTION_SYSTEM = f"""You are a data extraction assistant. Extract pizza order information from the conversation the user sends. Match items EXACTLY to the Nunzio's Pizza menu.
+
+MENU:
+{MENU_REFERENCE}
+
+Return ONLY a JSON object with these fields:
+{{
+    "customer_name": name if mentioned or null,
+    "items": detailed description of ALL items ordered. MUST match menu items exactly (use exact pizza names from menu: "Vodka Pizza", "Nunzio's Special", "Chicken Parm", etc.). Include size, quantity, customizations. Format as clear string describing each item. If multiple items, list them all. If null, return empty string,
+    "order_type": "delivery" or "pickup" or null,
+    "delivery_address": full address if delivery mentioned or null,
+    "pickup_name": name for pickup order if mentioned or null,
+    "phone_number": phone number if mentioned or null,
+    "special_instructions": any special requests, instructions, or notes or null,
+    "payment_method": "cash" or "card" or null,
+    "total_estimate": estimated total price if calculable or null,
+    "order_confirmed": true if customer said "yes", "correct", "that's right" to order confirmation, false otherwise
+}}
+
+IMPORTANT: 
+- Match pizza names EXACTLY to the menu (e.g., "Vodka Pizza", not "vodka sauce pizza")
+- Extract everything mentioned, even partial information
+- If customer confirmed the order (said yes/correct), set order_confirmed to true"""
+
+# Model for order extraction; set EXTRACTION_MODEL=gpt-3.5-turbo to roll back
+EXTRACTION_MODEL = os.getenv("EXTRACTION_MODEL", "gpt-4o-mini")
+EXTRACTION_MAX_TOKENS = 200  # the JSON object is ~150 tokens
+
+# Fixed text around the conversation in the extraction user message
+_EXTRACT_PREFIX = "Conversation:\n"
+_EXTRACT_SUFFIX = "\n\nExtract now."
+
+
+# Sampling settings for caller replies
+RESPONSE_PARAMS = {
+    "model": "gpt-3.5-turbo",  # Fastest OpenAI model for maximum speed
+    "temperature": 0.3,  # Lower for faster, more consistent responses
+    "max_tokens": 35,  # Reduced for fastest responses (very brief)
+    "top_p": 0.9,  # Faster generation
+    "frequency_penalty": 0.1  # Reduce repetition
+}
+
+
+def _response_messages(prompt: str, user_input: str, conversation_history: list, summary: str = None):
+    """Build the chat messages for a reply; returns (messages, recent_history)."""
+    # The system prompt goes first, unchanged, so OpenAI's prompt caching
+    # can reuse it; per-call context follows it.
+    messages = [{"role": "system", "content": prompt}]
+    if summary:
+        messages.append({"role": "system", "content": f"Earlier context: {summary}"})
+    
+    # Add conversation history (only last 4 turns for speed - maintains recent context)
+    # This reduces API latency while keeping essential context
+    recent_history = conversation_history[-4:] if len(conversation_history) > 4 else conversation_history
+    for turn in recent_history:
+        messages.append({"role": "user", "content": turn.get("user", "")})
+        messages.append({"role": "assistant", "content": turn.get("assistant", "")})
+    
+    # Add current user input
+    messages.append({"role": "user", "content": user_input})
+    return messages, recent_history
+
+
+async def generate_response(
+    user_input: str,
+    conversation_history: list = None,
+    system_prompt: str = None,
+    summary: str = None
+) -> str:
     """
     Generate AI response using OpenAI.
     
@@ -49,141 +346,473 @@ def generate_response(user_input: str, conversation_history: list = None, system
         user_input: The caller's speech input
         conversation_history: Previous conversation turns
         system_prompt: Optional custom system prompt (uses default if None)
+        summary: Optional rolling summary of turns older than the recent window
     
     Returns:
         AI response text
     """
-    from prompts import SYSTEM_PROMPT
-    
     if conversation_history is None:
         conversation_history = []
     
     # Use provided system prompt or default
     prompt = system_prompt if system_prompt else SYSTEM_PROMPT
+    messages, recent_history = _response_messages(prompt, user_input, conversation_history, summary)
     
-    # Build messages
-    messages = [{"role": "system", "content": prompt}]
+    # Only context-free opening turns are safe to answer from the semantic cache
+    query = None
+    if SEMANTIC_CACHE_ENABLED and not recent_history and not summary and not _PII_RE.search(user_input):
+        prompt_key = hashlib.sha256(prompt.encode("utf-8")).digest()
+        try:
+            query = await _embed(user_input)
+            cached = _semantic_lookup(prompt_key, query)
+            if cached is not None:
+                return cached
+        except Exception as e:
+            logger.warning("Semantic cache lookup failed: %s", e)
+            query = None
     
-    # Add conversation history (only last 4 turns for speed - maintains recent context)
-    # This reduces API latency while keeping essential context
-    recent_history = conversation_history[-4:] if len(conversation_history) > 4 else conversation_history
-    for turn in recent_history:
-        messages.append({"role": "user", "content": turn.get("user", "")})
-        messages.append({"role": "assistant", "content": turn.get("assistant", "")})
+    try:
+        reply = await _chat_completion(messages=messages, **RESPONSE_PARAMS)
+        
+        if query is not None:
+            _semantic_store(prompt_key, query, reply)
+        return reply
     
-    # Add current user input
-    messages.append({"role": "user", "content": user_input})
+    except Exception:
+        logger.exception("Error generating response")
+        return "I apologize, I'm having trouble processing that. Could you please repeat?"
+
+
+async def stream_response(
+    user_input: str,
+    conversation_history: list = None,
+    system_prompt: str = None,
+    summary: str = None
+) -> AsyncIterator[str]:
+    """
+    Stream an AI response as it is generated, for pipelines that can start
+    speaking on the first words (e.g. Twilio Media Streams) instead of
+    waiting for the whole reply like generate_response.
+    
+    Args are the same as generate_response. Bypasses the reply caches.
+    
+    The concurrency slot is only held while the stream is opened. A caller
+    that may stop early should close the generator so the HTTP response is
+    released right away rather than at garbage collection:
     
+        chunks = stream_response(user_input, history, prompt)
+        try:
+            async for text in chunks:
+                ...
+        finally:
+            await chunks.aclose()
+    
+    Yields:
+        Pieces of the response text as they arrive
+    """
+    prompt = system_prompt if system_prompt else SYSTEM_PROMPT
+    messages, _ = _response_messages(prompt, user_input, conversation_history or [], summary)
+    
+    stream = await _create_completion(messages=messages, stream=True, **RESPONSE_PARAMS)
     try:
-        client = get_openai_client()
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",  # Fastest OpenAI model for maximum speed
-            messages=messages,
-            temperature=0.3,  # Lower for faster, more consistent responses
-            max_tokens=35,  # Reduced for fastest responses (very brief)
-            top_p=0.9,  # Faster generation
-            frequency_penalty=0.1  # Reduce repetition
-        )
+        async for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+    finally:
+        await stream.close()
+
+
+async def collect(chunks: AsyncIterator[str]) -> str:
+    """Join a streamed response into the full text."""
+    return "".join([chunk async for chunk in chunks]).strip()
+
+
+# Turns sent verbatim to the LLM; everything before is covered by the
+# rolling summary, which main refreshes every SUMMARY_EVERY_TURNS turns
+HISTORY_WINDOW = 4
+SUMMARY_EVERY_TURNS = 10
+
+# Bounds on the conversation text sent for extraction. The recent window
+# covers every turn since the rolling summary was last refreshed, so nothing
+# falls between the two.
+EXTRACTION_RECENT_TURNS = HISTORY_WINDOW + SUMMARY_EVERY_TURNS
+EXTRACTION_MAX_CHARS = 2000  # ~500 tokens
+
+# Assistant filler that carries no order details
+_FILLER_RE = re.compile(r"^(sure|okay|ok|got it|one moment)\b[^.?!]{0,20}[.!]?$", re.IGNORECASE)
+
+
+def _condense(conversation_history: list, summary: str = None) -> str:
+    """
+    Flatten conversation turns into one bounded string for extraction.
+    
+    Keeps the most recent turns verbatim (prefixed by the rolling summary when
+    older turns are dropped), skips assistant filler, and caps the length,
+    keeping the end of the conversation.
+    """
+    turns = conversation_history
+    parts = []
+    if summary and len(turns) > EXTRACTION_RECENT_TURNS:
+        turns = turns[-EXTRACTION_RECENT_TURNS:]
+        parts.append(f"[Earlier turns summary]: {summary}")
+    
+    for turn in turns:
+        parts.append(turn.get("user", ""))
+        assistant = turn.get("assistant", "")
+        if len(assistant) >= 15 and not _FILLER_RE.match(assistant):
+            parts.append(assistant)
+    
+    text = " ".join(parts)
+    if len(text) > EXTRACTION_MAX_CHARS:
+        text = text[-EXTRACTION_MAX_CHARS:]
+    return text
+
+
+def _parse_extraction(result_text: str):
+    """Parse the model's JSON reply (requested in JSON mode, so no code fences)."""
+    return orjson.loads(result_text)
+
+
+def _fallback_extraction(conversation_history: list) -> Dict[str, Optional[str]]:
+    """Best-effort order info from the raw conversation when extraction fails."""
+    items_text = ""
+    for turn in conversation_history:
+        user_text = turn.get("user", "").lower()
+        if any(word in user_text for word in ["pizza", "order", "want", "like", "get"]):
+            items_text += turn.get("user", "") + " "
+    
+    return {
+        "customer_name": None,
+        "items": items_text.strip() if items_text else "Order details from conversation (extraction failed)",
+        "order_type": None,
+        "delivery_address": None,
+        "pickup_name": None,
+        "phone_number": None,
+        "special_instructions": None,
+        "payment_method": None,
+        "total_estimate": None,
+        "order_confirmed": False
+    }
+
+
+def _extraction_request(full_text: str) -> dict:
+    """Chat completion parameters for extracting one conversation."""
+    return {
+        "model": EXTRACTION_MODEL,
+        "messages": [
+            {"role": "system", "content": EXTRACTION_SYSTEM},
+            {"role": "user", "content": _EXTRACT_PREFIX + full_text + _EXTRACT_SUFFIX}
+        ],
+        "temperature": 0,  # Deterministic, so repeats are served from the LLM cache
+        "max_tokens": EXTRACTION_MAX_TOKENS,
+        "response_format": {"type": "json_object"}
+    }
+
+
+async def _extract_single(full_text: str) -> Dict[str, Optional[str]]:
+    """Run one extraction request for a single conversation."""
+    result_text = await _chat_completion(**_extraction_request(full_text))
+    return _parse_extraction(result_text)
+
+
+# Coalesce extractions that arrive close together into one OpenAI request to
+# save RPM quota when many lines are active. Off by default.
+EXTRACTION_BATCHING = os.getenv("EXTRACTION_BATCHING", "").lower() in ("1", "true", "yes")
+EXTRACTION_BATCH_WINDOW = 0.05  # seconds
+EXTRACTION_BATCH_MAX = 8
+
+
+class BatchingExtractor:
+    """Collects extraction requests for a short window and sends them as one request."""
+    
+    def __init__(self, window: float = EXTRACTION_BATCH_WINDOW, max_batch: int = EXTRACTION_BATCH_MAX):
+        self.window = window
+        self.max_batch = max_batch
+        self._queue = None
+        self._worker = None
+        self._tasks = set()
+    
+    async def extract(self, full_text: str) -> Dict[str, Optional[str]]:
+        """Queue a conversation and wait for its extracted order info."""
+        if self._worker is None or self._worker.done():
+            self._queue = asyncio.Queue()
+            self._worker = asyncio.create_task(self._run())
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((full_text, future))
+        return await future
+    
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.window
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            task = asyncio.create_task(self._dispatch(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+    
+    async def _dispatch(self, batch: list):
+        if len(batch) > 1:
+            try:
+                results = await self._extract_many([text for text, _ in batch])
+            except Exception as e:
+                logger.warning("Batched extraction failed, retrying %d individually: %s", len(batch), e)
+            else:
+                for (_, future), result in zip(batch, results):
+                    if not future.done():
+                        future.set_result(result)
+                return
         
-        return response.choices[0].message.content.strip()
+        # Single item, or the batched reply could not be demuxed
+        async def run_one(text, future):
+            try:
+                result = await _extract_single(text)
+            except Exception as e:
+                if not future.done():
+                    future.set_exception(e)
+            else:
+                if not future.done():
+                    future.set_result(result)
+        
+        await asyncio.gather(*(run_one(text, future) for text, future in batch))
     
-    except Exception as e:
-        import logging
-        logger = logging.getLogger(__name__)
-        logger.error(f"Error generating response: {e}", exc_info=True)
-        return "I apologize, I'm having trouble processing that. Could you please repeat?"
+    async def _extract_many(self, texts: list) -> list:
+        conversations = "\n\n".join(
+            f"Conversation {i}:\n{text}" for i, text in enumerate(texts, 1)
+        )
+        user_message = (
+            f"{conversations}\n\nExtract JSON for each conversation above. "
+            f'Return ONLY a JSON object {{"results": [...]}} where "results" is an array of length {len(texts)}, '
+            f"one object per conversation, in order."
+        )
+        result_text = await _chat_completion(
+            model=EXTRACTION_MODEL,
+            messages=[
+                {"role": "system", "content": EXTRACTION_SYSTEM},
+                {"role": "user", "content": user_message}
+            ],
+            temperature=0,
+            max_tokens=EXTRACTION_MAX_TOKENS * len(texts),
+            response_format={"type": "json_object"}
+        )
+        results = _parse_extraction(result_text).get("results")
+        if not isinstance(results, list) or len(results) != len(texts):
+            raise ValueError(f"expected a JSON array of {len(texts)} results")
+        return results
+
+
+_batching_extractor = None
 
 
-def extract_order_info(conversation_history: list) -> Dict[str, Optional[str]]:
+def get_batching_extractor() -> BatchingExtractor:
+    """Get or create the shared batching extractor."""
+    global _batching_extractor
+    if _batching_extractor is None:
+        _batching_extractor = BatchingExtractor()
+    return _batching_extractor
+
+
+# Nothing to extract without any of these words, so such conversations
+# skip the LLM call. Built from generic ordering words plus menu item names.
+_ORDER_WORDS = {
+    "pizza", "pizzas", "pie", "pies", "slice", "slices", "order", "delivery", "deliver",
+    "pickup", "pick", "small", "medium", "large", "want", "like", "get", "have", "take",
+    "calzone", "wings", "salad", "soda", "menu",
+}
+_MENU_ITEM_WORDS = {
+    word
+    for line in MENU_REFERENCE.splitlines() if line.startswith("- ")
+    for word in re.findall(r"[a-z']{4,}", re.split(r" - |\(", line[2:])[0].lower())
+}
+_MENU_KEYWORD_RE = re.compile(
+    r"\b(" + "|".join(sorted(map(re.escape, _ORDER_WORDS | _MENU_ITEM_WORDS))) + r")\b",
+    re.IGNORECASE
+)
+
+_EMPTY_ORDER = {
+    "customer_name": None,
+    "items": None,
+    "order_type": None,
+    "delivery_address": None,
+    "pickup_name": None,
+    "phone_number": None,
+    "special_instructions": None,
+    "payment_method": None,
+    "total_estimate": None,
+    "order_confirmed": False
+}
+
+
+async def extract_order_info(conversation_history: list, summary: str = None) -> Dict[str, Optional[str]]:
     """
     Extract structured order information from conversation.
     
+    Args:
+        conversation_history: Conversation turns
+        summary: Optional rolling summary of turns older than the recent ones
+    
     Returns:
         Dictionary with order details
     """
-    # Combine all conversation text
-    full_text = " ".join([
-        turn.get("user", "") + " " + turn.get("assistant", "")
-        for turn in conversation_history
-    ])
+    full_text = _condense(conversation_history, summary)
+    if len(full_text) < 20 or not _MENU_KEYWORD_RE.search(full_text):
+        return dict(_EMPTY_ORDER)
+    
+    try:
+        if EXTRACTION_BATCHING:
+            return await get_batching_extractor().extract(full_text)
+        return await _extract_single(full_text)
     
-    # Use LLM to extract structured data
-    from prompts import MENU_REFERENCE
-    extraction_prompt = f"""Extract pizza order information from this conversation. Match items EXACTLY to the Nunzio's Pizza menu.
+    except Exception:
+        logger.exception("Error extracting order info")
+        # If extraction fails, try to get basic info from conversation text
+        return _fallback_extraction(conversation_history)
 
-MENU:
-{MENU_REFERENCE}
+# Offline extraction of stored transcripts goes through the OpenAI Batch API
+# (half price, separate rate limit pool); results can take up to 24h
+BATCH_POLL_SECONDS = 60
 
-Conversation:
-{full_text}
 
-Return ONLY a JSON object with these fields:
-{{
-    "customer_name": name if mentioned or null,
-    "items": detailed description of ALL items ordered. MUST match menu items exactly (use exact pizza names from menu: "Vodka Pizza", "Nunzio's Special", "Chicken Parm", etc.). Include size, quantity, customizations. Format as clear string describing each item. If multiple items, list them all. If null, return empty string,
-    "order_type": "delivery" or "pickup" or null,
-    "delivery_address": full address if delivery mentioned or null,
-    "pickup_name": name for pickup order if mentioned or null,
-    "phone_number": phone number if mentioned or null,
-    "special_instructions": any special requests, instructions, or notes or null,
-    "payment_method": "cash" or "card" or null,
-    "total_estimate": estimated total price if calculable or null,
-    "order_confirmed": true if customer said "yes", "correct", "that's right" to order confirmation, false otherwise
-}}
-
-IMPORTANT: 
-- Match pizza names EXACTLY to the menu (e.g., "Vodka Pizza", not "vodka sauce pizza")
-- Extract everything mentioned, even partial information
-- If customer confirmed the order (said yes/correct), set order_confirmed to true"""
+async def extract_order_info_batch(conversation_histories: list, poll_interval: float = BATCH_POLL_SECONDS) -> list:
+    """
+    Extract order information from many stored conversations via the Batch API.
+    
+    Not for the live call path: this waits until OpenAI finishes the batch.
+    
+    Args:
+        conversation_histories: List of conversation histories
+        poll_interval: Seconds between batch status checks
+    
+    Returns:
+        List of order info dictionaries, in the same order as the input
+    """
+    if not conversation_histories:
+        return []
+    
+    # Not latency sensitive, so let the SDK retry these calls itself
+    client = get_openai_client().with_options(max_retries=2)
+    lines = [
+        orjson.dumps({
+            "custom_id": str(i),
+            "method": "POST",
+            "url": "/v1/chat/completions",
+            "body": _extraction_request(_condense(history))
+        })
+        for i, history in enumerate(conversation_histories)
+    ]
+    input_file = await client.files.create(
+        file=("extraction.jsonl", b"\n".join(lines)),
+        purpose="batch",
+        timeout=120.0
+    )
+    batch = await client.batches.create(
+        input_file_id=input_file.id,
+        endpoint="/v1/chat/completions",
+        completion_window="24h"
+    )
+    logger.info("Submitted extraction batch %s (%d conversations)", batch.id, len(lines))
+    
+    while batch.status not in ("completed", "failed", "expired", "cancelled"):
+        await asyncio.sleep(poll_interval)
+        batch = await client.batches.retrieve(batch.id)
+    if batch.status != "completed":
+        raise RuntimeError(f"Extraction batch {batch.id} {batch.status}")
+    
+    results = [None] * len(conversation_histories)
+    if batch.output_file_id:
+        output = await client.files.content(batch.output_file_id, timeout=120.0)
+        for line in output.text.splitlines():
+            if not line.strip():
+                continue
+            item = orjson.loads(line)
+            try:
+                content = item["response"]["body"]["choices"][0]["message"]["content"]
+                results[int(item["custom_id"])] = _parse_extraction(content.strip())
+            except Exception as e:
+                logger.warning("Batch extraction %s failed: %s", item.get("custom_id"), e)
+    
+    return [
+        result if result is not None else _fallback_extraction(history)
+        for result, history in zip(results, conversation_histories)
+    ]
 
+async def summarize_conversation(conversation_history: list, previous_summary: str = None) -> Optional[str]:
+    """
+    Condense earlier conversation turns into a short summary.
+    
+    Args:
+        conversation_history: Turns to summarize
+        previous_summary: Summary of turns before these, if any
+    
+    Returns:
+        Summary text, or previous_summary if summarization fails
+    """
+    if not conversation_history:
+        return previous_summary
+    
+    text = "\n".join(
+        f"Caller: {turn.get('user', '')}\nAssistant: {turn.get('assistant', '')}"
+        for turn in conversation_history
+    )
+    if previous_summary:
+        text = f"Summary so far: {previous_summary}\n\n{text}"
+    
     try:
-        client = get_openai_client()
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",  # Fast model for data extraction
+        return await _chat_completion(
+            model="gpt-3.5-turbo",
             messages=[
-                {"role": "system", "content": "You are a data extraction assistant. Return only valid JSON."},
-                {"role": "user", "content": extraction_prompt}
+                {"role": "system", "content": "Summarize this phone order conversation in 2-3 sentences. Keep names, items, sizes, order type, address and anything the caller confirmed."},
+                {"role": "user", "content": text}
             ],
-            temperature=0.2,  # Lower for more consistent extraction
-            max_tokens=400,  # Reduced for faster response
-            top_p=0.9
+            temperature=0.2,
+            max_tokens=120
         )
-        
-        result_text = response.choices[0].message.content.strip()
-        # Remove markdown code blocks if present
-        if result_text.startswith("```"):
-            result_text = result_text.split("```")[1]
-            if result_text.startswith("json"):
-                result_text = result_text[4:]
-        
-        return json.loads(result_text)
     
-    except Exception as e:
-        print(f"Error extracting order info: {e}")
-        # If extraction fails, try to get basic info from conversation text
-        items_text = ""
-        for turn in conversation_history:
-            user_text = turn.get("user", "").lower()
-            if any(word in user_text for word in ["pizza", "order", "want", "like", "get"]):
-                items_text += turn.get("user", "") + " "
-        
-        return {
-            "customer_name": None,
-            "items": items_text.strip() if items_text else "Order details from conversation (extraction failed)",
-            "order_type": None,
-            "delivery_address": None,
-            "pickup_name": None,
-            "phone_number": None,
-            "special_instructions": None,
-            "payment_method": None,
-            "total_estimate": None,
-            "order_confirmed": False
-        }
+    except Exception:
+        logger.exception("Error summarizing conversation")
+        return previous_summary
 
 # Keep old function name for backward compatibility
-def extract_appointment_info(conversation_history: list) -> Dict[str, Optional[str]]:
+async def extract_appointment_info(conversation_history: list) -> Dict[str, Optional[str]]:
     """Alias for extract_order_info for backward compatibility."""
-    return extract_order_info(conversation_history)
+    return await extract_order_info(conversation_history)
+
+
+# Order email layout, filled in per order
+_ORDER_SUBJECT = f"New Order - {CFG.office_name}"
+_ORDER_BODY_TEMPLATE = """
+NEW ORDER - {timestamp}
+
+Caller Phone: {caller_phone}
+
+ORDER DETAILS:
+- Customer Name: {customer_name}
+- Order Type: {order_type}
+- Delivery Address: {delivery_address}
+- Pickup Name: {pickup_name}
+- Payment Method: {payment_method}
+- Estimated Total: {total_estimate}
+
+ITEMS ORDERED:
+{items}
+
+SPECIAL INSTRUCTIONS:
+{special_instructions}
+
+CONVERSATION SUMMARY:
+{conversation_summary}
+
+---
+This order was taken by the AI order system.
+Please prepare the order and contact customer if needed.
+"""
 
 
 def send_order_summary_email(
@@ -202,17 +831,12 @@ def send_order_summary_email(
     Returns:
         True if email sent successfully
     """
-    if not OFFICE_EMAIL or not GMAIL_USER or not GMAIL_APP_PASSWORD:
-        print("Email configuration missing. Skipping email send.")
+    cfg = CFG
+    if not cfg.email_configured:
+        logger.warning("Email configuration missing. Skipping email send.")
         return False
     
     try:
-        # Create email
-        msg = MIMEMultipart()
-        msg['From'] = GMAIL_USER
-        msg['To'] = OFFICE_EMAIL
-        msg['Subject'] = f"New Order - {OFFICE_NAME}"
-        
         # Format items
         items_text = "No items specified"
         if order_info.get('items'):
@@ -223,51 +847,58 @@ def send_order_summary_email(
             else:
                 items_text = str(order_info['items']) if order_info['items'] else "No items specified"
         
-        # Build email body
-        body = f"""
-NEW ORDER - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
-
-Caller Phone: {caller_phone}
-
-ORDER DETAILS:
-- Customer Name: {order_info.get('customer_name', 'Not provided')}
-- Order Type: {order_info.get('order_type', 'Not specified').upper() if order_info.get('order_type') else 'Not specified'}
-- Delivery Address: {order_info.get('delivery_address', 'N/A')}
-- Pickup Name: {order_info.get('pickup_name', 'N/A')}
-- Payment Method: {order_info.get('payment_method', 'Not specified')}
-- Estimated Total: {order_info.get('total_estimate', 'N/A')}
-
-ITEMS ORDERED:
-{items_text}
-
-SPECIAL INSTRUCTIONS:
-{order_info.get('special_instructions', 'None')}
-
-CONVERSATION SUMMARY:
-{conversation_summary}
-
----
-This order was taken by the AI order system.
-Please prepare the order and contact customer if needed.
-"""
+        order_type = order_info.get('order_type')
+        body = _ORDER_BODY_TEMPLATE.format_map({
+            "timestamp": datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            "caller_phone": caller_phone,
+            "customer_name": order_info.get('customer_name', 'Not provided'),
+            "order_type": order_type.upper() if order_type else 'Not specified',
+            "delivery_address": order_info.get('delivery_address', 'N/A'),
+            "pickup_name": order_info.get('pickup_name', 'N/A'),
+            "payment_method": order_info.get('payment_method', 'Not specified'),
+            "total_estimate": order_info.get('total_estimate', 'N/A'),
+            "items": items_text,
+            "special_instructions": order_info.get('special_instructions', 'None'),
+            "conversation_summary": conversation_summary,
+        })
         
-        msg.attach(MIMEText(body, 'plain'))
+        msg = EmailMessage()
+        msg['From'] = cfg.gmail_user
+        msg['To'] = cfg.office_email
+        msg['Subject'] = _ORDER_SUBJECT
+        msg.set_content(body)
         
         # Send email
-        server = smtplib.SMTP('smtp.gmail.com', 587)
-        server.starttls()
-        server.login(GMAIL_USER, GMAIL_APP_PASSWORD)
-        server.send_message(msg)
-        server.quit()
+        _send_smtp(msg)
         
-        print(f"Call summary email sent to {OFFICE_EMAIL}")
+        logger.info("Call summary email sent to %s", cfg.office_email)
         return True
     
-    except Exception as e:
-        print(f"Error sending email: {e}")
+    except Exception:
+        logger.exception("Error sending email")
         return False
 
 
+def _send_email_with_retry(caller_phone: str, order_info: Dict, conversation_summary: str) -> bool:
+    """Send an order email, retrying with exponential backoff."""
+    if not CFG.email_configured:
+        return send_order_summary_email(caller_phone, order_info, conversation_summary)
+    for attempt in range(EMAIL_MAX_ATTEMPTS):
+        if send_order_summary_email(caller_phone, order_info, conversation_summary):
+            return True
+        if attempt < EMAIL_MAX_ATTEMPTS - 1:
+            time.sleep(2 ** attempt)
+    return False
+
+
+async def send_order_email(caller_phone: str, order_info: Dict, conversation_summary: str) -> bool:
+    """Send an order email and wait for it, running SMTP in a thread."""
+    return await asyncio.to_thread(_send_email_with_retry, caller_phone, order_info, conversation_summary)
+
+
+ORDER_PLACED_SUMMARY = "Order placed. See details above."
+
+
 def save_order_simple(order_info: Dict, caller_phone: str) -> bool:
     """
     Save order - sends email and optionally integrates with POS system.
@@ -277,14 +908,10 @@ def save_order_simple(order_info: Dict, caller_phone: str) -> bool:
         caller_phone: Caller's phone number
     
     Returns:
-        True if order saved
+        True if the email was sent
     """
     # Send email notification
-    email_sent = send_order_summary_email(
-        caller_phone=caller_phone,
-        order_info=order_info,
-        conversation_summary="Order placed. See details above."
-    )
+    email_sent = _send_email_with_retry(caller_phone, order_info, ORDER_PLACED_SUMMARY)
     
     # Note: POS integration would need to be async - keeping sync for now
     # To enable POS integration, update save_order_simple to be async and call it properly